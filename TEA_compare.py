@@ -0,0 +1,143 @@
+import numpy as np
+
+from TEA_engine import cumulative_cost
+
+
+# Cost components of the stackplots, bottom to top, with their labels
+STACK_COMPONENTS = ['IT_cost_m', 'cooling_cost_evap_m',
+                    'maintenance_cost_year_m', 'capital_cost_m']
+STACK_LABELS = ['IT', 'Cooling', 'Maintenance', 'Capital costs']
+
+
+def case_color(cmap, case, n_case, offset=-0.1):
+    """
+    Color of a case along a colormap, also defined for a single case
+    """
+    return cmap(case/max(n_case - 1, 1) + offset)
+
+
+def compare_cases(results, case_name, pairwise_months=True):
+    """
+    Compares any number of cases of a run
+    results: output of TEA_engine.compute, (n_case, n_month) arrays
+    case_name: list of case names
+    pairwise_months: also compute the month by month pairwise differences
+                     of the cumulative costs and the crossover months, which
+                     take (n_case x n_case x n_month) memory
+    Returns a dict with
+        'cumulative': (n_case, n_month) cumulative total costs
+        'totals': (n_case, n_component) totals of STACK_COMPONENTS and of
+                  the total cost
+        'component_delta': (n_case, n_case, n_component) differences of the
+                           totals, row case minus column case
+        'ranking': case indices from the cheapest to the most expensive
+        'delta': (n_case, n_case, n_month) cumulative cost differences
+        'crossover': (n_case, n_case) first month from which the row case
+                     stays cheaper than the column case, -1 if never
+    """
+    components = STACK_COMPONENTS + ['total_cost_m']
+    cumulative = cumulative_cost(results['total_cost_m'])
+    totals = np.stack([results[component].sum(axis=-1, dtype=np.float64)
+                       for component in components], axis=-1)
+
+    comparison = {'case_name': list(case_name),
+                  'components': components,
+                  'cumulative': cumulative,
+                  'totals': totals,
+                  'component_delta': totals[:, None, :] - totals[None, :, :],
+                  'ranking': np.argsort(totals[:, -1], kind='stable')}
+
+    if pairwise_months:
+        delta = cumulative[:, None, :] - cumulative[None, :, :]
+        # Months from which the row case is cheaper until the end
+        cheaper = np.flip(np.logical_and.accumulate(
+            np.flip(delta < 0, axis=-1), axis=-1), axis=-1)
+        comparison['delta'] = delta
+        comparison['crossover'] = np.where(
+            cheaper[..., -1], np.argmax(cheaper, axis=-1), -1)
+    return comparison
+
+
+def plot_small_multiples(figure, results, case_name, with_IT=True,
+                         n_columns=None):
+    """
+    Draws one cumulative cost decomposition stackplot per case, with
+    common axis limits
+    figure: matplotlib figure
+    results: output of TEA_engine.compute
+    case_name: list of case names
+    with_IT: include the IT electricity costs
+    n_columns: number of columns of the grid, square-ish if None
+    Returns the array of axes
+    """
+    import matplotlib.pyplot as plt
+    cmap = plt.get_cmap('viridis')
+
+    first = 0 if with_IT else 1
+    components = STACK_COMPONENTS[first:]
+    labels = STACK_LABELS[first:]
+    colors = [cmap(k/5) for k in range(first + 1, 5)]
+
+    n_case = len(case_name)
+    if n_columns is None:
+        n_columns = int(np.ceil(np.sqrt(n_case))) if n_case > 2 else n_case
+    n_rows = int(np.ceil(n_case/n_columns))
+
+    # (case, component, month) cumulative costs in k$
+    stacks = np.stack([cumulative_cost(results[component])
+                       for component in components], axis=1)/1e3
+    years = results['month_numbers']/12
+    limits = [years[0], years[-1]], [0, stacks.sum(axis=1).max()]
+
+    # Axes share fixed limits instead of matplotlib axis sharing, whose
+    # autoscaling grows with the square of the number of panels
+    axes = figure.subplots(n_rows, n_columns, squeeze=False)
+    small = n_case > 4
+    for case, ax in enumerate(axes.flat):
+        if case >= n_case:
+            ax.set_visible(False)
+            continue
+        ax.set_autoscale_on(False)
+        ax.set_xlim(limits[0])
+        ax.set_ylim(limits[1])
+        ax.stackplot(years, stacks[case], colors=colors, labels=labels)
+        ax.set_title(case_name[case], fontsize=6 if small else None,
+                     pad=2 if small else None)
+        column = case % n_columns
+        if small:
+            ax.tick_params(labelsize=5, length=2, pad=1)
+        if column != 0:
+            ax.tick_params(labelleft=False)
+        if case + n_columns < n_case:
+            ax.tick_params(labelbottom=False)
+        elif not small:
+            ax.set_xlabel('Time [years]')
+        if column == 0 and not small:
+            ax.set_ylabel('Cost decomposition [k$]')
+    if small:
+        figure.supxlabel('Time [years]')
+        figure.supylabel('Cost decomposition [k$]')
+    axes[0, 0].legend(loc='upper left')
+    return axes
+
+
+def plot_delta_matrix(ax, comparison, component='total_cost_m'):
+    """
+    Draws the pairwise differences of the total of a component as a matrix
+    ax: matplotlib axes
+    comparison: output of compare_cases
+    component: one of comparison['components']
+    """
+    delta = comparison['component_delta'][
+        ..., comparison['components'].index(component)]/1e3
+    limit = np.abs(delta).max() or 1
+    image = ax.imshow(delta, cmap='RdBu_r', vmin=-limit, vmax=limit)
+    n_case = len(comparison['case_name'])
+    if n_case <= 30:
+        ax.set_xticks(range(n_case))
+        ax.set_xticklabels(comparison['case_name'], rotation=90)
+        ax.set_yticks(range(n_case))
+        ax.set_yticklabels(comparison['case_name'])
+    ax.set_title('Row case minus column case [k$]')
+    ax.figure.colorbar(image, ax=ax)
+    return image
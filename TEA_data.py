@@ -0,0 +1,219 @@
+import re
+import numpy as np
+
+
+# Sectors of the EIA retail price data
+SECTORS = ['all sectors', 'residential', 'commercial', 'industrial',
+           'transportation', 'other']
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep',
+          'Oct', 'Nov', 'Dec']
+
+COLUMN_PATTERN = re.compile(
+    '(.*) (' + '|'.join(SECTORS) + ') cents per kilowatthour$')
+
+
+def month_index(month):
+    """
+    Returns the number of months since January of year 0
+    month: 8-char string, 0-2: month code, 4-7: year
+    """
+    return 12*int(month[4:]) + MONTHS.index(month[:3])
+
+
+class PriceCube:
+    """
+    (state x sector x month) retail prices, gap-filled and validated once
+    """
+
+    def __init__(self, months, columns, retail_prices, max_gap_ratio=0.5):
+        """
+        Builds the price cube from the parsed EIA table
+        months: chronological month labels, e.g. 'Jan 2001'
+        columns: column names, e.g. 'Texas industrial cents per kilowatthour'
+        retail_prices: chronological (month x column) table (cents/kWh),
+                       blank (NaN) or 0 where a month has no data
+        max_gap_ratio: series missing more than this fraction of the months
+                       are not filled and refused by lookup
+        """
+        self.months = np.asarray(months)
+        self.month_index = np.array([month_index(month) for month in months])
+        if np.any(np.diff(self.month_index) != 1):
+            raise ValueError('The price data months are not consecutive')
+        if np.any(retail_prices < 0):
+            raise ValueError('The price data contains negative prices')
+
+        self.states = []
+        positions = []
+        for column, name in enumerate(columns):
+            match = COLUMN_PATTERN.match(name)
+            if match is None:
+                raise ValueError('Unexpected price data column: ' + name)
+            if match.group(1) not in self.states:
+                self.states.append(match.group(1))
+            positions.append((self.states.index(match.group(1)),
+                              SECTORS.index(match.group(2)), column))
+        self.state_index = {state: k for k, state in enumerate(self.states)}
+        self.sector_index = {sector: k for k, sector in enumerate(SECTORS)}
+
+        # Prices ($/kWh), NaN where a state does not report a sector
+        self.cube = np.full((len(self.states), len(SECTORS), len(months)),
+                            np.nan)
+        for state, sector, column in positions:
+            self.cube[state, sector] = retail_prices[:, column]/100
+        # A price of exactly 0 means no sales that month, missing as blanks
+        self.cube[self.cube == 0] = np.nan
+
+        # Interior gaps are interpolated, edge gaps take the nearest value
+        missing = np.isnan(self.cube)
+        self.filled = missing.sum(axis=-1)
+        self.valid = self.filled <= max_gap_ratio*len(months)
+        steps = np.arange(len(months))
+        for state, sector in zip(*np.nonzero(self.valid &
+                                             missing.any(axis=-1))):
+            series = self.cube[state, sector]
+            known = ~missing[state, sector]
+            series[~known] = np.interp(steps[~known], steps[known],
+                                       series[known])
+        self.filled[~self.valid] = 0
+
+    def indices(self, states, sectors):
+        """
+        Returns the state and sector indices, raises KeyError if unknown
+        """
+        try:
+            state_index = [self.state_index[state] for state in states]
+        except KeyError as error:
+            raise KeyError('Unknown state: ' + str(error.args[0]))
+        try:
+            sector_index = [self.sector_index[sector] for sector in sectors]
+        except KeyError as error:
+            raise KeyError('Unknown sector: ' + str(error.args[0]))
+        return state_index, sector_index
+
+    def lookup(self, states, sectors, sim_time_m=None):
+        """
+        Returns the prices ($/kWh) of the last sim_time_m months
+        states: list of state names
+        sectors: list of sectors among SECTORS
+        sim_time_m: number of months, all months if None. Longer horizons
+                    start with the first month of the data and hold its
+                    last price beyond it.
+        Returns a (state x sector x month) array, raises ValueError if a
+        requested series has too little data
+        """
+        state_index, sector_index = self.indices(states, sectors)
+        grid = np.ix_(state_index, sector_index)
+        invalid = ~self.valid[grid]
+        if invalid.any():
+            state, sector = np.argwhere(invalid)[0]
+            raise ValueError('No price data for ' + states[state] + ' ' +
+                             sectors[sector])
+        prices = self.cube[grid]
+        if sim_time_m is not None:
+            prices = prices[..., -sim_time_m:]
+            extra = sim_time_m - prices.shape[-1]
+            if extra > 0:
+                prices = np.concatenate(
+                    [prices, np.repeat(prices[..., -1:], extra, axis=-1)],
+                    axis=-1)
+        return prices
+
+    def report(self):
+        """
+        Returns the filled month counts and the refused series
+        """
+        filled = {}
+        for state, sector in zip(*np.nonzero(self.filled)):
+            filled[(self.states[state], SECTORS[sector])] = \
+                int(self.filled[state, sector])
+        refused = [(self.states[state], SECTORS[sector])
+                   for state, sector in zip(*np.nonzero(~self.valid))]
+        return {'filled': filled, 'refused': refused}
+
+
+# Days of the months of a non-leap year
+MONTH_DAYS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# Average hours of a month over the Gregorian cycle
+MEAN_MONTH_HOURS = 24*365.2425/12
+
+
+def leap_year(year):
+    """
+    Returns whether years of the Gregorian calendar are leap years
+    """
+    return (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+
+
+def days_in_month(months):
+    """
+    Returns the number of days of months given as month_index values
+    months: integer array of month indices
+    """
+    months = np.asarray(months)
+    year, month = np.divmod(months, 12)
+    return MONTH_DAYS[month] + (leap_year(year) & (month == 1))
+
+
+class ActivityModel:
+    """
+    Hours of activity of the IT load generated from the calendar
+    """
+
+    def __init__(self, availability=1., planned_outage_h=0.,
+                 outage_month=None):
+        """
+        availability: expected fraction of the hours the IT load runs,
+                      unplanned outages included
+        planned_outage_h: planned maintenance downtime (h) per year
+        outage_month: month code (e.g. 'Aug') of the planned downtime,
+                      None to spread it over the year
+        """
+        if not 0 <= availability <= 1:
+            raise ValueError('availability must be between 0 and 1')
+        if outage_month is not None and outage_month not in MONTHS:
+            raise ValueError('Unknown month: ' + str(outage_month))
+        self.availability = availability
+        self.planned_outage_h = planned_outage_h
+        self.outage_month = outage_month
+
+    @classmethod
+    def from_profile(cls, activity_hours):
+        """
+        Fits the availability of a measured monthly activity profile
+        activity_hours: hours of activity per month, array
+        """
+        return cls(min(float(np.mean(activity_hours))/MEAN_MONTH_HOURS, 1.))
+
+    def key(self):
+        """
+        Returns a string identifying the model, for the run versions
+        """
+        return 'calendar %r %r %r' % (self.availability,
+                                      self.planned_outage_h,
+                                      self.outage_month)
+
+    def hours(self, months):
+        """
+        Returns the hours of activity of each month
+        months: integer array of month indices, see month_index
+        """
+        days = days_in_month(months)
+        hours = 24*days*self.availability
+        if self.outage_month is None:
+            year_days = 365 + leap_year(np.asarray(months)//12)
+            hours = hours - self.planned_outage_h*days/year_days
+        else:
+            hours = hours - self.planned_outage_h*(
+                np.asarray(months) % 12 == MONTHS.index(self.outage_month))
+        return np.maximum(hours, 0.)
+
+    def daily_hours(self, months):
+        """
+        Returns the hours of activity of each day of the months, the
+        monthly hours being evenly split over the days
+        months: integer array of month indices, see month_index
+        """
+        days = days_in_month(months)
+        return np.repeat(self.hours(months)/days, days)
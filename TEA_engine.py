@@ -0,0 +1,705 @@
+import os
+import hashlib
+import tempfile
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import TEA_profiling
+from TEA_data import PriceCube, ActivityModel
+
+
+# Input data shipped next to the interface scripts
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+PRICE_FILE = os.path.join(
+    DATA_DIR, 'Average_retail_price_of_electricity_monthly.csv')
+ACTIVITY_FILE = os.path.join(DATA_DIR, 'Activity_hours_monthly.csv')
+
+# Binary copy of the parsed csv files, rebuilt when they change
+CACHE_FILE = os.path.join(DATA_DIR, 'TEA_data_cache.npz')
+
+# Monthly cost components returned by the engine
+COMPONENTS = ['capital_cost_m', 'IT_cost_m', 'cooling_cost_evap_m',
+              'maintenance_cost_year_m', 'op_cost_m', 'total_cost_m',
+              'elec_consumption']
+
+# Storage precisions of the monthly components
+PRECISIONS = ['float64', 'float32']
+
+# Version of the cost model, part of the data version so that runs stored
+# by an older model are computed again
+MODEL_VERSION = '2'
+
+
+def cumulative_cost(cost_m):
+    """
+    Cumulative sum over the months, always accumulated in float64
+    cost_m: monthly cost array (..., n_month), of any precision
+    """
+    return np.cumsum(cost_m, axis=-1, dtype=np.float64)
+
+
+def net_present_cost(results):
+    """
+    Net present value of the costs of each case, accumulated in float64
+    results: output of TEA_engine.compute, monthly costs already discounted
+    """
+    return results['total_cost_m'].sum(axis=-1, dtype=np.float64)
+
+
+class TEA_engine:
+    """
+    Headless cost model behind the TEA interface
+    """
+
+    def __init__(self, price_file=PRICE_FILE, activity_file=ACTIVITY_FILE,
+                 precision='float64', cache_file=CACHE_FILE, activity=None):
+        """
+        Imports the price and activity data
+        price_file: path of the EIA monthly retail price csv
+        activity_file: path of the monthly activity hours csv
+        precision: storage precision of the monthly components, among
+                   PRECISIONS. The model is always evaluated in float64,
+                   'float32' halves the memory of the results.
+        cache_file: binary cache of the parsed data, None to always parse
+                    the csv files
+        activity: TEA_data.ActivityModel generating the activity hours from
+                  the calendar, fitted on the activity file if None, or
+                  'profile' to take the last months of the activity file
+                  as they are
+        """
+        if precision not in PRECISIONS:
+            raise ValueError('precision must be one of ' + str(PRECISIONS))
+        self.dtype = np.dtype(precision)
+
+        self.price_file = price_file
+        self.activity_file = activity_file
+        self.cache_file = cache_file
+
+        # Version of the input files, identifies the cache
+        self.file_stamps = {path: self.file_stamp(path)
+                            for path in [price_file, activity_file]}
+        self.file_version = self.version()
+
+        if cache_file is None or not self.load_cache(cache_file):
+            self.load_csv(price_file, activity_file)
+            if cache_file is not None:
+                self.save_cache(cache_file)
+
+        # Gap filling and validation, once for all lookups
+        self.prices = PriceCube(self.treated_months, self.price_columns,
+                                self.retail_prices)
+        self.set_activity(activity)
+
+    def set_activity(self, activity=None):
+        """
+        Selects how the activity hours are generated, see __init__
+        The version of the data, which identifies the stored runs, covers
+        the input files, the activity model and MODEL_VERSION.
+        """
+        self.activity_option = activity
+        if isinstance(activity, str):
+            if activity != 'profile':
+                raise ValueError('activity must be an ActivityModel, None '
+                                 "or 'profile'")
+            self.activity = None
+            key = activity
+        else:
+            self.activity = activity or ActivityModel.from_profile(
+                self.activity_hours)
+            key = self.activity.key()
+        self.data_version = hashlib.sha1(
+            (self.file_version + key + MODEL_VERSION).encode()).hexdigest()
+        # Activity hours of each horizon, generated on first use
+        self.activity_cache = {}
+
+    @staticmethod
+    def file_stamp(path):
+        """
+        Returns the modification time, size and content hash of a file
+        """
+        status = os.stat(path)
+        with open(path, 'rb') as file:
+            digest = hashlib.sha1(file.read()).hexdigest()
+        return status.st_mtime_ns, status.st_size, digest
+
+    def version(self):
+        """
+        Hashes the contents of the input files
+        """
+        digest = hashlib.sha1()
+        for path in [self.price_file, self.activity_file]:
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+        return digest.hexdigest()
+
+    def load_csv(self, price_file, activity_file):
+        """
+        Parses the csv files, pandas is only imported here
+        """
+        self.treated_months, self.price_columns, self.retail_prices = \
+            self.load_prices(price_file)
+        self.activity_hours = self.load_activity(activity_file)
+
+    @staticmethod
+    def load_prices(price_file):
+        """
+        Parses the EIA price csv file
+        Returns the chronological month labels, the price columns and the
+        chronological (month x column) price table (cents/kWh)
+        """
+        with TEA_profiling.stage('csv loading'):
+            import pandas as pd
+            retail_price_data = pd.read_csv(price_file, skiprows=4)
+
+        # The EIA export repeats each month, only the first row is filled
+        unique_price_data = retail_price_data.drop_duplicates(
+            'Month', keep='first')
+        treated_months = np.flip(
+            unique_price_data['Month'].to_numpy(dtype=str))
+        price_columns = np.array(unique_price_data.columns[1:], dtype=str)
+        retail_prices = np.flip(unique_price_data[
+            price_columns].to_numpy(dtype=float), axis=0)
+        return treated_months, price_columns, retail_prices
+
+    @staticmethod
+    def load_activity(activity_file):
+        """
+        Parses the activity hours csv file, returns the hours of each month
+        """
+        with TEA_profiling.stage('csv loading'):
+            import pandas as pd
+            activity_hours = pd.read_csv(activity_file)
+        activity_hours = activity_hours['hours'].to_numpy(dtype=float)
+        if activity_hours.size == 0 or not np.all(np.isfinite(
+                activity_hours)) or np.any(activity_hours < 0):
+            raise ValueError('The activity data must hold non-negative '
+                             'hours for every month')
+        return activity_hours
+
+    def changed_files(self):
+        """
+        Returns the input files whose content changed since they were
+        loaded. Files are only hashed again when their modification time
+        or size changed.
+        """
+        changed = []
+        for path, stamp in self.file_stamps.items():
+            status = os.stat(path)
+            if (status.st_mtime_ns, status.st_size) == stamp[:2]:
+                continue
+            new_stamp = self.file_stamp(path)
+            if new_stamp[2] != stamp[2]:
+                changed.append(path)
+            else:
+                # Touched but identical, the new time avoids rehashing
+                self.file_stamps[path] = new_stamp
+        return changed
+
+    @TEA_profiling.profiled('data reload')
+    def reload(self):
+        """
+        Reloads the input files that changed, and only them
+        Returns None if nothing changed, else a dict with the changed
+        'files', the 'states' whose results changed, and the previous and
+        new data versions ('old_version', 'data_version')
+        """
+        changed = self.changed_files()
+        if not changed:
+            return None
+
+        # Everything is parsed and checked before the engine changes, a
+        # failed reload leaves it as it was and is retried on the next call
+        stamps = {path: self.file_stamp(path) for path in changed}
+        old_prices = self.prices
+        prices = old_prices
+        price_data = (self.treated_months, self.price_columns,
+                      self.retail_prices)
+        activity_hours = self.activity_hours
+        states = set()
+        if self.price_file in changed:
+            price_data = self.load_prices(self.price_file)
+            prices = PriceCube(*price_data)
+            states.update(self.changed_states(old_prices, prices))
+        if self.activity_file in changed:
+            # The activity hours enter every run
+            activity_hours = self.load_activity(self.activity_file)
+            states.update(old_prices.states + prices.states)
+        file_version = self.version()
+
+        old_version = self.data_version
+        self.treated_months, self.price_columns, self.retail_prices = \
+            price_data
+        self.activity_hours = activity_hours
+        self.prices = prices
+        self.file_stamps.update(stamps)
+        self.file_version = file_version
+        self.set_activity(self.activity_option)
+        if self.cache_file is not None:
+            self.save_cache(self.cache_file)
+        return {'files': changed, 'states': sorted(states),
+                'old_version': old_version,
+                'data_version': self.data_version}
+
+    @staticmethod
+    def changed_states(old_prices, prices):
+        """
+        Returns the states whose price series differ between two cubes
+        """
+        if not np.array_equal(old_prices.months, prices.months):
+            # Runs use the last months, a new month shifts every state
+            return set(old_prices.states + prices.states)
+        changed = set(old_prices.states) ^ set(prices.states)
+        for state in set(old_prices.states) & set(prices.states):
+            old = old_prices.state_index[state]
+            new = prices.state_index[state]
+            if not (np.array_equal(old_prices.cube[old], prices.cube[new],
+                                   equal_nan=True) and
+                    np.array_equal(old_prices.valid[old],
+                                   prices.valid[new])):
+                changed.add(state)
+        return changed
+
+    def load_cache(self, cache_file):
+        """
+        Loads the binary cache, returns False if missing, outdated or
+        unreadable
+        """
+        if not os.path.exists(cache_file):
+            return False
+        with TEA_profiling.stage('cache loading'):
+            try:
+                with np.load(cache_file, allow_pickle=False) as cache:
+                    if 'file_version' not in cache.files or \
+                            str(cache['file_version']) != self.file_version:
+                        return False
+                    data = [cache[name] for name in
+                            ['treated_months', 'price_columns',
+                             'retail_prices', 'activity_hours']]
+            except Exception:
+                # A corrupt or truncated cache is rebuilt from the csv files
+                return False
+        self.treated_months, self.price_columns, self.retail_prices, \
+            self.activity_hours = data
+        return True
+
+    def save_cache(self, cache_file):
+        """
+        Writes the binary cache, skipped if the directory is read-only
+        The cache is written to a temporary file, then moved in place, so
+        that processes reading or writing it at the same time never see a
+        partial file.
+        """
+        try:
+            handle, path = tempfile.mkstemp(
+                suffix='.npz', dir=os.path.dirname(os.path.abspath(
+                    cache_file)))
+        except OSError:
+            return
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                np.savez(file, file_version=self.file_version,
+                         treated_months=self.treated_months,
+                         price_columns=self.price_columns,
+                         retail_prices=self.retail_prices,
+                         activity_hours=self.activity_hours)
+            os.replace(path, cache_file)
+        except OSError:
+            os.remove(path)
+
+    @TEA_profiling.profiled('electricity price')
+    def compute_electricity_price(self, target_state, sim_time_m,
+                                  sector='industrial'):
+        """
+        Computes electricity prices ($/kWh) over the last sim_time_m months
+        target_state: Name of the U.S. state (string)
+        sim_time_m: simulation time in months (int), any length. Beyond the
+                    price data, the last price is held.
+        sector: string among 'all sectors','residential', 'commercial',
+                'industrial', 'transportation', 'other'
+                defaults to 'industrial'
+        """
+        return self.prices.lookup([target_state], [sector], sim_time_m)[0, 0]
+
+    def electricity_prices(self, states, sectors, sim_time_m):
+        """
+        Returns the electricity prices ($/kWh) of many states and sectors
+        over the last sim_time_m months, as a (state x sector x month) array
+        states: list of state names
+        sectors: list of sectors, see TEA_data.SECTORS
+        sim_time_m: simulation time in months (int), see
+                    compute_electricity_price
+        """
+        return self.prices.lookup(states, sectors, sim_time_m)
+
+    def compute_activity_hours(self, sim_time_m):
+        """
+        Returns the hours of activity of the sim_time_m months starting with
+        the first month of the prices of the simulation, read-only
+        sim_time_m: simulation time in months (int), any length, up to the
+                    length of the activity file with activity='profile'
+        """
+        if self.activity is None:
+            if sim_time_m > self.activity_hours.size:
+                raise ValueError('The simulation time exceeds the activity '
+                                 'profile, use the calendar activity model')
+            return self.activity_hours[-sim_time_m:]
+        hours = self.activity_cache.get(sim_time_m)
+        if hours is None:
+            start = self.prices.month_index[-min(sim_time_m,
+                                                 len(self.treated_months))]
+            hours = self.activity.hours(start + np.arange(sim_time_m))
+            hours.flags.writeable = False
+            self.activity_cache[sim_time_m] = hours
+        return hours
+
+    def month_numbers(self, sim_time_m):
+        """
+        Returns the month indices covered by the simulation
+        sim_time_m: simulation time in months (int)
+        """
+        return np.arange(sim_time_m)
+
+    @TEA_profiling.profiled('cost model')
+    def compute_costs(self, electricity_price, activity_hours, IT_load, PUE,
+                      lifetime_y, installation_init_cost, renewal_cost,
+                      maintenance_rate, interest_rate, first_month=0,
+                      steps_per_year=12):
+        """
+        Computes the monthly cost components of every case at once
+        electricity_price: ($/kWh) array (..., n_month)
+        activity_hours: hours of activity per month, array (..., n_month)
+        IT_load: IT load (kW), scalar or array (...)
+        PUE, lifetime_y, installation_init_cost, renewal_cost,
+        maintenance_rate: case parameters, arrays (..., n_case)
+        interest_rate: annual interest rate (fraction), scalar or array (...)
+        first_month: index of the first month, to compute a block of months
+        steps_per_year: time steps per year, 12 for monthly inputs. With
+                        another resolution (e.g. 365 for days), the inputs
+                        and the returned arrays are per step, the interest
+                        is compounded and the maintenance spread per step,
+                        and the renewals fall every lifetime_y*steps_per_year
+                        steps.
+        Returns a dict of (..., n_case, n_month) arrays keyed by COMPONENTS
+        """
+        electricity_price = np.asarray(electricity_price, dtype=float)
+        n_month = electricity_price.shape[-1]
+        electricity_price = electricity_price[..., None, :]
+        activity_hours = np.asarray(
+            activity_hours, dtype=float)[..., None, :n_month]
+        IT_load = np.asarray(IT_load, dtype=float)[..., None, None]
+        interest_rate = np.asarray(interest_rate, dtype=float)[..., None, None]
+        PUE = np.asarray(PUE, dtype=float)[..., None]
+        lifetime_m = (np.asarray(lifetime_y, dtype=float)*steps_per_year
+                      ).astype(int)[..., None]
+        if np.any(lifetime_m < 1):
+            raise ValueError('lifetime_y must cover at least one time step')
+        installation_init_cost = np.asarray(
+            installation_init_cost, dtype=float)[..., None]
+        renewal_cost = np.asarray(renewal_cost, dtype=float)[..., None]
+        maintenance_rate = np.asarray(maintenance_rate, dtype=float)[..., None]
+
+        month_numbers = first_month + np.arange(n_month)
+        discount = (1 + interest_rate/steps_per_year)**(-month_numbers)
+        shape = np.broadcast_shapes(
+            electricity_price.shape, activity_hours.shape, IT_load.shape,
+            PUE.shape, installation_init_cost.shape)
+
+        # Installation cost (first month) and replacement costs
+        renewal = (month_numbers % lifetime_m == 0) & (month_numbers != 0)
+        capital_cost_m = np.where(renewal, renewal_cost*discount, 0.)
+        capital_cost_m = np.broadcast_to(capital_cost_m, shape).copy()
+        if first_month == 0:
+            capital_cost_m[..., 0] += installation_init_cost[..., 0]
+
+        # IT and cooling costs
+        IT_cost_m = np.broadcast_to(
+            IT_load*electricity_price*activity_hours*discount, shape).copy()
+        cooling_cost_evap_m = (PUE - 1)*IT_load*electricity_price * \
+            activity_hours*discount
+
+        # Total energy consumption
+        elec_consumption = np.broadcast_to(
+            PUE*IT_load*activity_hours, shape).copy()
+
+        # Maintenance costs
+        maintenance_cost_year_m = np.broadcast_to(
+            maintenance_rate*installation_init_cost/steps_per_year*discount,
+            shape).copy()
+
+        # Total operational and total costs (monthly)
+        op_cost_m = IT_cost_m + cooling_cost_evap_m + maintenance_cost_year_m
+        total_cost_m = capital_cost_m + op_cost_m
+
+        results = {'capital_cost_m': capital_cost_m,
+                   'IT_cost_m': IT_cost_m,
+                   'cooling_cost_evap_m': cooling_cost_evap_m,
+                   'maintenance_cost_year_m': maintenance_cost_year_m,
+                   'op_cost_m': op_cost_m,
+                   'total_cost_m': total_cost_m,
+                   'elec_consumption': elec_consumption}
+        for name in COMPONENTS:
+            results[name] = results[name].astype(self.dtype, copy=False)
+        return results
+
+    def iter_chunks(self, electricity_price, activity_hours, IT_load, PUE,
+                    lifetime_y, installation_init_cost, renewal_cost,
+                    maintenance_rate, interest_rate, case_chunk=4096,
+                    month_chunk=120, steps_per_year=12):
+        """
+        Computes the costs block by block, so that only one block of
+        (case_chunk, month_chunk) arrays is alive at a time
+        electricity_price: ($/kWh) array (n_month,)
+        activity_hours: hours of activity per step, array (n_month,)
+        IT_load: IT load (kW)
+        PUE, lifetime_y, installation_init_cost, renewal_cost,
+        maintenance_rate: case parameters, arrays (n_case,)
+        interest_rate: annual interest rate (fraction)
+        case_chunk: number of cases per block
+        month_chunk: number of steps per block
+        steps_per_year: time steps per year, see compute_costs
+        Yields (cases, months, block) with cases and months the slices of
+        the block and block the dict of compute_costs, along with the
+        running cumulative total cost 'cumulative_cost_m'
+        """
+        electricity_price = np.asarray(electricity_price, dtype=float)
+        activity_hours = np.asarray(activity_hours, dtype=float)
+        case_parameters = [np.asarray(parameter, dtype=float) for parameter
+                           in [PUE, lifetime_y, installation_init_cost,
+                               renewal_cost, maintenance_rate]]
+        n_case = case_parameters[0].size
+        n_month = electricity_price.size
+
+        for case_start in range(0, n_case, case_chunk):
+            cases = slice(case_start, min(case_start + case_chunk, n_case))
+            carry = 0.
+            for month_start in range(0, n_month, month_chunk):
+                months = slice(month_start,
+                               min(month_start + month_chunk, n_month))
+                block = self.compute_costs(
+                    electricity_price[months], activity_hours[months],
+                    IT_load, *[parameter[cases] for parameter in
+                               case_parameters],
+                    interest_rate, first_month=month_start,
+                    steps_per_year=steps_per_year)
+                block['cumulative_cost_m'] = carry + cumulative_cost(
+                    block['total_cost_m'])
+                carry = block['cumulative_cost_m'][:, -1:]
+                yield cases, months, block
+
+    @TEA_profiling.profiled('chunked evaluation')
+    def compute_chunked(self, electricity_price, activity_hours, IT_load,
+                        PUE, lifetime_y, installation_init_cost,
+                        renewal_cost, maintenance_rate, interest_rate,
+                        case_chunk=4096, month_chunk=120, spill=None,
+                        spill_components=('total_cost_m',),
+                        steps_per_year=12):
+        """
+        Evaluates very large problems with bounded memory
+        Arguments as iter_chunks, plus
+        spill: optional directory where the monthly values of
+               spill_components are written to memory-mapped .npy files
+        spill_components: components kept on disk when spilling
+        Returns a dict with the per-case totals of COMPONENTS over the
+        horizon ('totals', (n_case,) arrays), summary statistics of the
+        total cost across cases ('statistics') and the memory-mapped
+        (n_case, n_month) arrays when spilling ('spill')
+        """
+        n_case = np.size(PUE)
+        n_month = np.size(electricity_price)
+        totals = {component: np.zeros(n_case) for component in COMPONENTS}
+        spilled = {}
+        if spill is not None:
+            os.makedirs(spill, exist_ok=True)
+            for component in spill_components:
+                spilled[component] = np.lib.format.open_memmap(
+                    os.path.join(spill, component + '.npy'), mode='w+',
+                    dtype=self.dtype, shape=(n_case, n_month))
+
+        for cases, months, block in self.iter_chunks(
+                electricity_price, activity_hours, IT_load, PUE, lifetime_y,
+                installation_init_cost, renewal_cost, maintenance_rate,
+                interest_rate, case_chunk, month_chunk, steps_per_year):
+            for component in COMPONENTS:
+                totals[component][cases] += block[component].sum(
+                    axis=-1, dtype=np.float64)
+            for component, array in spilled.items():
+                array[cases, months] = block[component]
+
+        for array in spilled.values():
+            array.flush()
+
+        total_cost = totals['total_cost_m']
+        statistics = {'mean': float(total_cost.mean()),
+                      'std': float(total_cost.std()),
+                      'min': float(total_cost.min()),
+                      'max': float(total_cost.max()),
+                      'argmin': int(total_cost.argmin())}
+        for percentile in [5, 50, 95]:
+            statistics['p' + str(percentile)] = float(np.percentile(
+                total_cost, percentile))
+        return {'totals': totals, 'statistics': statistics,
+                'spill': spilled}
+
+    def compute(self, state_name, sim_time_y, n_rack, rack_consumption,
+                PUE, lifetime_y, installation_init_cost, renewal_cost,
+                maintenance_rate, interest_rate, price_type='Future',
+                sector='industrial'):
+        """
+        Computes the TEA of one data center
+        state_name: Name of the U.S. state (string)
+        sim_time_y: simulation time in years, any length: the last price of
+                    the data is held beyond it
+        n_rack: number of racks
+        rack_consumption: consumption of a rack (kW)
+        PUE, lifetime_y, installation_init_cost, renewal_cost,
+        maintenance_rate: lists with one value per case
+        interest_rate: annual interest rate (fraction)
+        price_type: 'Future' (no discounting) or 'Present'
+        sector: electricity sector of the price data
+        Returns a dict with the components of COMPONENTS as (n_case, n_month)
+        arrays, along with 'month_numbers' and 'electricity_price'
+        """
+        if price_type == 'Future':
+            interest_rate = 0
+
+        sim_time_m = int(round(12*sim_time_y))
+        electricity_price = self.compute_electricity_price(
+            state_name, sim_time_m, sector)
+        activity_hours = self.compute_activity_hours(sim_time_m)
+
+        results = self.compute_costs(
+            electricity_price, activity_hours, n_rack*rack_consumption, PUE,
+            lifetime_y, installation_init_cost, renewal_cost,
+            maintenance_rate, interest_rate)
+        results['month_numbers'] = self.month_numbers(sim_time_m)
+        results['electricity_price'] = electricity_price
+        results['interest_rate'] = interest_rate
+        return results
+
+    @TEA_profiling.profiled('backtest')
+    def backtest(self, state_name, sim_time_y, n_rack, rack_consumption, PUE,
+                 lifetime_y, installation_init_cost, renewal_cost,
+                 maintenance_rate, interest_rate, price_type='Future',
+                 sector='industrial', arrays=False):
+        """
+        Replays the TEA over every historical window of the price data
+        Arguments as compute, plus
+        arrays: also return the monthly components of every window
+        Returns a dict with
+            'start_months': first month of each window (n_window,)
+            'net_present_cost': (n_window, n_case) total cost of each case
+            'best_case': (n_window,) index of the cheapest case
+            'best_share': (n_case,) share of the windows where each case
+                          is the cheapest
+            'interest_rate': discount rate of the costs, 0 if 'Future'
+            and, with arrays, the COMPONENTS as (n_window, n_case, n_month)
+        """
+        if price_type == 'Future':
+            interest_rate = 0
+
+        sim_time_m = int(round(12*sim_time_y))
+        price = self.prices.lookup([state_name], [sector])[0, 0]
+        if sim_time_m > price.size:
+            raise ValueError('The simulation time exceeds the price data')
+
+        # (n_window, n_month) strided views, one row per start month
+        windows = sliding_window_view(price, sim_time_m)
+        if self.activity is None:
+            activity_hours = self.compute_activity_hours(sim_time_m)
+        else:
+            activity_hours = sliding_window_view(
+                self.activity.hours(self.prices.month_index), sim_time_m)
+        results = self.compute_costs(
+            windows, activity_hours,
+            n_rack*rack_consumption, PUE, lifetime_y, installation_init_cost,
+            renewal_cost, maintenance_rate, interest_rate)
+
+        net_present = net_present_cost(results)
+        best_case = np.argmin(net_present, axis=-1)
+        backtest = {'start_months': self.treated_months[:len(windows)],
+                    'net_present_cost': net_present,
+                    'best_case': best_case,
+                    'best_share': np.bincount(
+                        best_case, minlength=net_present.shape[-1]) /
+                    len(windows),
+                    'interest_rate': interest_rate}
+        if arrays:
+            backtest.update(results)
+        return backtest
+
+    @TEA_profiling.profiled('portfolio')
+    def compute_portfolio(self, sites, sim_time_y, interest_rate,
+                          price_type='Future', sector='industrial'):
+        """
+        Computes the TEA of a fleet of data centers in one tensor pass
+        sites: list of dicts, one per site, with keys 'state', 'n_rack',
+               'rack_consumption' and the case lists 'case_name', 'PUE',
+               'lifetime_y', 'installation_init_cost', 'renewal_cost',
+               'maintenance_rate'. Every site must list the same number of
+               cases. Any other key (e.g. 'region') can be used to group.
+        sim_time_y: simulation time in years
+        interest_rate: annual interest rate (fraction)
+        price_type: 'Future' (no discounting) or 'Present'
+        sector: electricity sector of the price data
+        Returns a dict with the components of COMPONENTS as
+        (n_site, n_case, n_month) arrays and, when every site lists the
+        same case names, the fleet totals of 'total_cost_m' per case as
+        'fleet_cost_m' (n_case, n_month). Sites with other case names are
+        summed with aggregate_portfolio(results, 'case').
+        """
+        if price_type == 'Future':
+            interest_rate = 0
+
+        n_case = {len(site['case_name']) for site in sites}
+        if len(n_case) != 1:
+            raise ValueError('Every site must list the same number of cases')
+
+        sim_time_m = int(round(12*sim_time_y))
+        electricity_price = self.electricity_prices(
+            [site['state'] for site in sites], [sector], sim_time_m)[:, 0]
+        activity_hours = self.compute_activity_hours(sim_time_m)
+
+        def site_array(key):
+            return np.array([site[key] for site in sites], dtype=float)
+
+        results = self.compute_costs(
+            electricity_price, activity_hours,
+            site_array('n_rack')*site_array('rack_consumption'),
+            site_array('PUE'), site_array('lifetime_y'),
+            site_array('installation_init_cost'), site_array('renewal_cost'),
+            site_array('maintenance_rate'), interest_rate)
+        if all(site['case_name'] == sites[0]['case_name']
+               for site in sites):
+            results['fleet_cost_m'] = results['total_cost_m'].sum(
+                axis=0, dtype=np.float64)
+        results['month_numbers'] = self.month_numbers(sim_time_m)
+        results['electricity_price'] = electricity_price
+        results['interest_rate'] = interest_rate
+        results['sites'] = sites
+        return results
+
+    def aggregate_portfolio(self, results, by, component='total_cost_m'):
+        """
+        Sums a portfolio cost component over groups of sites or cases
+        results: output of compute_portfolio
+        by: 'case' to group the (site, case) cells by case name, e.g. by
+            cooling technology, giving (n_month,) arrays; or any site key
+            (e.g. 'state', 'region') to sum over the sites of each group,
+            giving (n_case, n_month) arrays
+        component: one of COMPONENTS
+        Returns a dict {group: summed array}, accumulated in float64
+        """
+        cost = results[component]
+        sites = results['sites']
+        groups = {}
+        if by == 'case':
+            for s, site in enumerate(sites):
+                for c, name in enumerate(site['case_name']):
+                    groups[name] = groups.get(name, 0) + cost[s, c].astype(
+                        np.float64)
+        else:
+            labels = [site[by] for site in sites]
+            for label in dict.fromkeys(labels):
+                members = [s for s in range(len(sites)) if labels[s] == label]
+                groups[label] = cost[members].sum(axis=0, dtype=np.float64)
+        return groups
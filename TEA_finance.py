@@ -0,0 +1,212 @@
+import numpy as np
+
+
+def monthly_rate(annual_rate):
+    """
+    Monthly rate of an annual rate, as the engine discounts
+    """
+    return np.asarray(annual_rate, dtype=float)/12
+
+
+def loan_schedule(principal, loan_rate, loan_term_m, n_month):
+    """
+    Amortizes loans with constant monthly payments from the second month
+    principal: borrowed amount ($), array (...)
+    loan_rate: annual loan rate (fraction), array (...)
+    loan_term_m: number of monthly payments, array (...)
+    n_month: number of months of the simulation
+    Returns the (..., n_month) payment and interest arrays
+    """
+    principal = np.asarray(principal, dtype=float)[..., None]
+    rate = monthly_rate(loan_rate)[..., None]
+    term = np.asarray(loan_term_m)[..., None]
+    month_numbers = np.arange(n_month)
+
+    # Constant payment, the limit L/n for a zero rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        payment = np.where(
+            rate == 0, principal/np.maximum(term, 1),
+            principal*rate/(1 - (1 + rate)**(-np.maximum(term, 1))))
+
+    # Balance before the payment of each month
+    paid = np.clip(month_numbers - 1, 0, term)
+    growth = (1 + rate)**paid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        balance = np.where(rate == 0, principal - payment*paid,
+                           principal*growth - payment*(growth - 1)/rate)
+    active = (month_numbers >= 1) & (month_numbers <= term)
+    payment_m = np.where(active, payment, 0.)
+    interest_m = np.where(active, rate*balance, 0.)
+    return payment_m, interest_m
+
+
+def straight_line_depreciation(capex_m, depreciation_m):
+    """
+    Depreciates every investment linearly from the month it is made
+    capex_m: (..., n_month) investments ($)
+    depreciation_m: depreciation period in months, array (...)
+    Returns the (..., n_month) depreciation charges
+    """
+    period = np.maximum(np.asarray(depreciation_m)[..., None], 1)
+    cumulative = np.cumsum(capex_m, axis=-1)
+    month_numbers = np.arange(capex_m.shape[-1])
+    # Investments older than the period are fully depreciated
+    expired = np.take_along_axis(
+        cumulative, np.broadcast_to(
+            np.clip(month_numbers - period, 0, None), cumulative.shape),
+        axis=-1)
+    expired = np.where(month_numbers - period >= 0, expired, 0.)
+    return (cumulative - expired)/period
+
+
+def net_present_value(cash_flow_m, annual_rate):
+    """
+    Discounts monthly cash flows as the engine does
+    cash_flow_m: (..., n_month) cash flows
+    annual_rate: annual discount rate (fraction), array broadcastable to
+                 the leading dimensions
+    """
+    rate = monthly_rate(annual_rate)[..., None]
+    month_numbers = np.arange(cash_flow_m.shape[-1])
+    return (cash_flow_m*(1 + rate)**(-month_numbers)).sum(axis=-1)
+
+
+def internal_rate_of_return(cash_flow_m, n_iteration=80):
+    """
+    Annual internal rate of return of monthly cash flows, by vectorized
+    bisection on the monthly rate
+    cash_flow_m: (..., n_month) cash flows, investments negative
+    n_iteration: number of bisection steps
+    Returns an array (...), NaN where the net present value does not
+    change sign between -50% and +100% per month
+    """
+    cash_flow_m = np.asarray(cash_flow_m, dtype=float)
+    month_numbers = np.arange(cash_flow_m.shape[-1])
+    shape = cash_flow_m.shape[:-1]
+
+    def npv(rate):
+        return (cash_flow_m*(1 + rate[..., None])**(-month_numbers)).sum(
+            axis=-1)
+
+    low = np.full(shape, -0.5)
+    high = np.full(shape, 1.)
+    npv_low = npv(low)
+    bracketed = np.sign(npv_low) != np.sign(npv(high))
+    for k in range(n_iteration):
+        middle = (low + high)/2
+        npv_middle = npv(middle)
+        lower = np.sign(npv_middle) == np.sign(npv_low)
+        low = np.where(lower, middle, low)
+        npv_low = np.where(lower, npv_middle, npv_low)
+        high = np.where(lower, high, middle)
+    return np.where(bracketed, (1 + (low + high)/2)**12 - 1, np.nan)
+
+
+def payback_month(cash_flow_m):
+    """
+    First month from which the cumulative cash flow stays non-negative
+    cash_flow_m: (..., n_month) cash flows, investments negative
+    Returns an integer array (...), -1 if never paid back
+    """
+    recovered = np.flip(np.logical_and.accumulate(
+        np.flip(np.cumsum(cash_flow_m, axis=-1) >= 0, axis=-1), axis=-1),
+        axis=-1)
+    return np.where(recovered[..., -1], np.argmax(recovered, axis=-1), -1)
+
+
+def cash_flows(results, installation_init_cost, discount_rate,
+               inflation_rate=0., loan_share=0., loan_rate=0.,
+               loan_term_y=10., tax_rate=0., depreciation_y=0.,
+               revenue_m=0.):
+    """
+    Cash-flow model of the cases of a run: financing, depreciation, taxes
+    and inflation, vectorized over every leading dimension
+    results: output of TEA_engine.compute (or compute_portfolio, backtest)
+             with undiscounted costs, i.e. price_type='Future'
+    installation_init_cost: installation cost of each case, array (..., n_case)
+    discount_rate: annual discount rate (fraction), separate from inflation
+    inflation_rate: annual inflation (fraction) of maintenance and renewals,
+                    electricity costs already follow the historical prices
+    loan_share: share of the installation cost financed by a loan
+    loan_rate: annual loan rate (fraction)
+    loan_term_y: loan duration (y)
+    tax_rate: tax rate (fraction) on the revenue minus the deductible
+              costs (operating costs, loan interest, depreciation)
+    depreciation_y: tax depreciation period (y) of the installation and
+                    renewals, 0 to expense them
+    revenue_m: monthly revenue ($), scalar or (..., n_case, n_month)
+    Case parameters are scalars or arrays broadcastable to (..., n_case)
+    Returns a dict of (..., n_case, n_month) monthly flows and of
+    (..., n_case) 'npv', 'irr' (annual) and 'payback_month'
+    """
+    if 'interest_rate' not in results:
+        raise ValueError("The results do not tell their interest rate, "
+                         "cash flows need undiscounted costs")
+    if np.any(np.asarray(results['interest_rate']) != 0):
+        raise ValueError("Cash flows need undiscounted costs, compute the "
+                         "run with price_type='Future'")
+
+    capital_cost_m = np.asarray(results['capital_cost_m'], dtype=float)
+    n_month = capital_cost_m.shape[-1]
+    month_numbers = np.arange(n_month)
+    inflation = (1 + monthly_rate(inflation_rate)[..., None])**month_numbers
+
+    electricity_m = np.asarray(results['IT_cost_m'], dtype=float) + \
+        results['cooling_cost_evap_m']
+    maintenance_m = results['maintenance_cost_year_m']*inflation
+    capex_m = capital_cost_m*inflation
+
+    # Loan on the installation, paid back in constant monthly payments
+    shape = capital_cost_m.shape[:-1]
+    principal = np.broadcast_to(
+        np.asarray(loan_share, dtype=float) *
+        np.asarray(installation_init_cost, dtype=float), shape)
+    loan_payment_m, loan_interest_m = loan_schedule(
+        principal, np.broadcast_to(loan_rate, shape),
+        np.broadcast_to(np.round(np.asarray(loan_term_y)*12).astype(int),
+                        shape), n_month)
+    capex_paid_m = capex_m.copy()
+    capex_paid_m[..., 0] -= principal
+
+    # Taxes on the revenue net of the deductible costs
+    depreciation_m = straight_line_depreciation(
+        capex_m, np.broadcast_to(
+            np.round(np.asarray(depreciation_y)*12).astype(int), shape))
+    deductible_m = electricity_m + maintenance_m + loan_interest_m + \
+        depreciation_m
+    tax_m = np.asarray(tax_rate, dtype=float)[..., None] * \
+        (revenue_m - deductible_m)
+
+    net_cash_flow_m = revenue_m - electricity_m - maintenance_m - \
+        capex_paid_m - loan_payment_m - tax_m
+    discount = (1 + monthly_rate(discount_rate)[..., None])**(-month_numbers)
+
+    return {'electricity_cost_m': electricity_m,
+            'maintenance_cost_m': maintenance_m,
+            'capex_m': capex_m,
+            'loan_payment_m': loan_payment_m,
+            'loan_interest_m': loan_interest_m,
+            'depreciation_m': depreciation_m,
+            'tax_m': tax_m,
+            'net_cash_flow_m': net_cash_flow_m,
+            'discounted_cash_flow_m': net_cash_flow_m*discount,
+            'npv': (net_cash_flow_m*discount).sum(axis=-1),
+            'irr': internal_rate_of_return(net_cash_flow_m),
+            'payback_month': payback_month(net_cash_flow_m)}
+
+
+def incremental_returns(finance, reference_case, discount_rate):
+    """
+    Returns of choosing each case rather than a reference case, e.g. a
+    more expensive cooling installation that lowers the electricity bill
+    finance: output of cash_flows
+    reference_case: index of the reference case along the case axis
+    discount_rate: annual discount rate (fraction)
+    Returns a dict of (..., n_case) 'npv', 'irr' and 'payback_month' of the
+    differences of net cash flows
+    """
+    flows = finance['net_cash_flow_m']
+    incremental = flows - flows[..., reference_case:reference_case + 1, :]
+    return {'npv': net_present_value(incremental, discount_rate),
+            'irr': internal_rate_of_return(incremental),
+            'payback_month': payback_month(incremental)}
@@ -1,8 +1,40 @@
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
+import time
+START_TIME = time.perf_counter()
+
+import sys
+import threading
 import tkinter as tk
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from TEA_engine import TEA_engine
+from TEA_store import TEA_store
+import TEA_profiling
+from TEA_report import STATES, PLOT_TYPES, REBUILT_PLOTS, STYLE, \
+    FIGURE_SIZE, draw_run, update_run
+
+# matplotlib is imported on first use, see pyplot()
+plt = None
+
+# Sliders: entry attribute, label, range, resolution and whether the
+# slider sets the value of the selected case
+SLIDERS = [('PUE', 'PUE', 1, 2, 0.01, True),
+           ('interest_rate', 'Annual interest rate (%)', 0, 20, 0.1, False),
+           ('rack_consumption', 'Rack consumption (kW)', 1, 50, 0.5, False),
+           ('lifetime', 'Lifetime (y)', 1, 30, 0.5, True)]
+
+# Minimum time (ms) between two live updates while a slider moves
+LIVE_INTERVAL = 30
+
+
+def pyplot():
+    """
+    Imports matplotlib.pyplot on first use and sets the plotting defaults
+    """
+    global plt
+    if plt is None:
+        with TEA_profiling.stage('matplotlib import'):
+            import matplotlib.pyplot
+        plt = matplotlib.pyplot
+        plt.rcParams.update(STYLE)
+    return plt
 
 
 class TEA_interface(tk.Tk):
@@ -18,30 +50,13 @@ class TEA_interface(tk.Tk):
         # Initialize TEA window
         win.title("TEA of cooling methods")
         win.iconbitmap("Stanford_icon.ico")
-        win.geometry("1300x800+10+10")
+        win.geometry("1300x870+10+10")
 
-        # Plotting default parameters
-        plt.rcParams['font.size'] = '10'
-        plt.rcParams['legend.fontsize'] = '7'
-        plt.rcParams['font.sans-serif'] = 'Helvetica'
-        plt.rcParams['font.family'] = 'sans-serif'
-        plt.rcParams['axes.spines.right'] = False
-        plt.rcParams['axes.spines.top'] = False
+        self.win = win
+        self.startup_times = {}
 
         # List of American States
-        list_states = ["United States", "Alabama", "Alaska", "Arizona",
-                       "Arkansas", "California", "Colorado", "Connecticut",
-                       "Delaware", "Florida", "Georgia", "Hawaii",
-                       "Idaho", "Illinois", "Indiana", "Iowa", "Kansas",
-                       "Kentucky", "Louisiana", "Maine", "Maryland",
-                       "Massachusetts", "Michigan", "Minnesota",
-                       "Mississippi", "Missouri", "Montana", "Nebraska",
-                       "Nevada", "New Hampshire", "New Jersey", "New Mexico",
-                       "New York", "North Carolina", "North Dakota",
-                       "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
-                       "Rhode Island", "South Carolina", "South Dakota",
-                       "Tennessee", "Texas", "Utah", "Vermont", "Virginia",
-                       "Washington", "West Virginia", "Wisconsin", "Wyoming"]
+        list_states = STATES
 
         # GUI initialization
         self.lbl1 = tk.Label(win, text='Simulation time (y)')
@@ -111,10 +126,16 @@ class TEA_interface(tk.Tk):
         else:
             self.b1 = tk.Button(win, text='Update', command=self.compute)
         self.b1.place(x=1300/2, y=140)
-        self.retail_price_data = pd.read_csv(
-            'Average_retail_price_of_electricity_monthly.csv', skiprows=4)
 
-        self.activity_hours = pd.read_csv('Activity_hours_monthly.csv')
+        # Data and heavy modules load in the background, Run waits for them
+        self.engine = None
+        self.load_error = None
+        self.store = TEA_store()
+        self.b1.config(state=tk.DISABLED)
+        self.loader = threading.Thread(target=self.load_data, daemon=True)
+        self.loader.start()
+        win.after_idle(self.window_shown)
+        win.after(20, self.check_loaded)
 
         self.b2 = tk.Button(win, text='Save figure', command=self.save_results)
         self.b2.place(x=1300/2 - 80, y=140)
@@ -126,10 +147,7 @@ class TEA_interface(tk.Tk):
 
         self.secondary_plot = tk.StringVar()
         self.secondary_plot.set('None')
-        list_plots = ["None", "Electricity consumption",
-                      "Electricity costs", "Cooling costs",
-                      "Maintenance costs", "Capital costs",
-                      "Stackplot", "Stackplot without IT"]
+        list_plots = PLOT_TYPES
         self.secondary_plot_menu = tk.OptionMenu(
             win, self.secondary_plot, *list_plots)
         self.secondary_plot_menu.place(x=1300/2 + 420, y=140)
@@ -144,6 +162,66 @@ class TEA_interface(tk.Tk):
         self.lb10 = tk.Label(win, text='Equivalent cost')
         self.lb10.place(x=1300/2 - 510, y=145)
 
+        # Sliders re-evaluate the last run while they move
+        self.live = None
+        self.live_pending = None
+        self.live_interval = LIVE_INTERVAL
+        self.sliders = {}
+        self.slider_positions = {}
+        for k, (name, label, low, high, resolution, per_case) in \
+                enumerate(SLIDERS):
+            self.sliders[name] = tk.Scale(
+                win, label=label, from_=low, to=high, resolution=resolution,
+                orient=tk.HORIZONTAL, length=220, state=tk.DISABLED,
+                command=self.slider_moved)
+            self.sliders[name].place(x=170 + 240*k, y=185)
+        self.slider_case = tk.StringVar()
+        self.slider_case_menu = tk.OptionMenu(win, self.slider_case, '')
+        self.slider_case_menu.place(x=20, y=205)
+
+    def load_data(self):
+        """
+        Loads the input data, then preloads matplotlib (background thread)
+        A failure is kept for check_loaded, which reports it.
+        """
+        try:
+            self.engine = TEA_engine()
+        except Exception as error:
+            self.load_error = error
+            return
+        import matplotlib.figure  # noqa: F401
+
+    def window_shown(self):
+        """
+        Records the startup time until the window is shown
+        """
+        self.startup_times['window'] = time.perf_counter() - START_TIME
+
+    def check_loaded(self):
+        """
+        Enables the Run button once the background loading is done, or
+        shows why the input data could not be loaded
+        """
+        if self.loader.is_alive():
+            self.win.after(20, self.check_loaded)
+            return
+        if self.load_error is not None:
+            from tkinter import messagebox
+            messagebox.showerror(
+                'TEA of cooling methods',
+                'The input data could not be loaded, Run is disabled:\n' +
+                type(self.load_error).__name__ + ': ' + str(self.load_error))
+            return
+        self.startup_times['interactive'] = time.perf_counter() - START_TIME
+        self.b1.config(state=tk.NORMAL)
+
+        # Cold start measurement, e.g. python TEA_interface_v2.py --startup
+        if '--startup' in sys.argv:
+            print('Window shown after %.0f ms, interactive after %.0f ms' % (
+                1e3*self.startup_times['window'],
+                1e3*self.startup_times['interactive']))
+            self.win.destroy()
+
     def custom_parser(self, string, type):
         """
         Custom parser for the text inputs
@@ -169,38 +247,26 @@ class TEA_interface(tk.Tk):
             elif type == 'float':
                 return [float(string)]
 
-    def compute_electricity_price(self, target_state, sector='industrial'):
-        """
-        Computes electricity prices
-        target_state: Name of the U.S. state (string)
-        sector: string among 'all sectors','residential', 'commercial',
-                'industrial', 'transportation', 'other'
-                defaults to 'industrial'
-        """
-
-        retail_price_daily = []
-        self.treated_months = []
-
-        # Clean price csv data
-        for month in self.retail_price_data['Month']:
-            if month not in self.treated_months:
-                retail_price_daily += [list(
-                    self.retail_price_data[target_state + ' ' +
-                                           sector+' cents per kilowatthour'][
-                        self.retail_price_data['Month'] == month])[0]]
-                self.treated_months.append(month)
-
-        # Keep data within sim_time_m
-        electricity_retail_price_m = np.flip(
-            retail_price_daily)[-self.sim_time_m:]/100
-        self.treated_months = np.flip(self.treated_months)
-
-        return electricity_retail_price_m
-
+    @TEA_profiling.profiled('compute')
     def compute(self):
         """
         Update function
         """
+        # Pick up the input files changed since the last run, an invalid
+        # file is reported and the loaded data is kept
+        try:
+            changes = self.engine.reload()
+        except Exception as error:
+            changes = None
+            from tkinter import messagebox
+            messagebox.showerror(
+                'TEA of cooling methods',
+                'A changed input file could not be loaded, the previously '
+                'loaded data is used:\n' + type(error).__name__ + ': ' +
+                str(error))
+        if changes is not None:
+            self.store.migrate(changes)
+
         # Remove previous plots
         if self.computed:
             self.plots.get_tk_widget().destroy()
@@ -226,275 +292,149 @@ class TEA_interface(tk.Tk):
             self.present_future_price.get(), 'str'
         )[0]
 
-        if price_type == 'Future':
-            interest_rate = 0
-
-        # Compute settings & initialize arrays
-        self.sim_time_m = int(round(12*sim_time_y))
-        electricity_price = self.compute_electricity_price(
-            target_state=state_name)
-        IT_load = n_rack * rack_consumption
-        n_case = len(case_name)
-        activity_hours = list(
-            self.activity_hours['hours'][-self.sim_time_m:])
-        month_numbers = np.array([k for k in range(
-            len(self.treated_months))])[:self.sim_time_m]
-
-        capital_cost_m = np.zeros((n_case, month_numbers.size))
-        elec_consumption = np.zeros((n_case, month_numbers.size))
-        IT_cost_m = np.zeros((n_case, month_numbers.size))
-        op_cost_m = np.zeros((n_case, month_numbers.size))
-        total_cost_m = np.zeros((n_case, month_numbers.size))
-        cooling_cost_evap_m = np.zeros((n_case, month_numbers.size))
-        maintenance_cost_year_m = np.zeros((n_case, month_numbers.size))
-
-        # Case iterations
-        for case in range(n_case):
-            lifetime_m = int(lifetime_y[case]*12)
-
-            # Installation cost (first day)
-            capital_cost_m[case][0] = installation_init_cost[case]
-
-            # Time iterations
-            for i in month_numbers:
-                # Replacement cost
-                if i % lifetime_m == 0 and i != 0:
-                    capital_cost_m[case][i] += renewal_cost[case] *\
-                        (1 + interest_rate/12)**(-i)
-
-                # IT cost
-                IT_cost_m[case][i] = IT_load * \
-                    electricity_price[i] * activity_hours[i] * \
-                    (1 + interest_rate/12)**(-i)
-
-                # Cooling costs
-                cooling_cost_evap_m[case][i] = (PUE[case]-1) * IT_load * \
-                    electricity_price[i] * activity_hours[i] * \
-                    (1 + interest_rate/12)**(-i)
-
-                # Total energy consumption
-                elec_consumption[case][i] = PUE[case] * \
-                    IT_load * activity_hours[i]
-
-                # Maintenance costs
-                maintenance_cost_year_m[case][i] = (
-                    maintenance_rate[case] * installation_init_cost[case]) \
-                    / 12 * (1 + interest_rate/12)**(-i)
-
-                # Total operational cost (monthly)
-                op_cost_m[case][i] = IT_cost_m[case][i] + \
-                    cooling_cost_evap_m[case][i] + \
-                    maintenance_cost_year_m[case][i]
-
-            # Total cost (daily)
-            total_cost_m[case] = capital_cost_m[case] + op_cost_m[case]
-
-        # Plot setup
-        self.figure = plt.Figure(figsize=(8.3, 4), dpi=150)
-        self.figure.suptitle("Datacenter TEA for "+state_name)
-        cmap = plt.get_cmap('viridis')
-        cmap_2 = plt.get_cmap('hot')
-        self.plots = FigureCanvasTkAgg(self.figure, root)
-        self.plots.get_tk_widget().pack(side=tk.BOTTOM)
-
-        # Cost of electricity plot
-        if self.secondary_plot.get() in ["None", "Electricity consumption",
-                                         "Electricity costs", "Cooling costs",
-                                         "Maintenance costs", "Capital costs"]:
-            ax1 = self.figure.add_subplot(121)
-            ax1.plot(month_numbers/12,
-                     self.compute_electricity_price(state_name),
-                     label='Electricity costs')
-            int_multip = [(1+interest_rate/12)**-i for i in month_numbers]
-
-            if price_type == 'Present':
-                ax1.plot(month_numbers/12,
-                         np.multiply(
-                             self.compute_electricity_price(state_name),
-                             int_multip),
-                         label='Prices corrected with interest rate')
-            ax1.legend()
-            ax1.set_xlabel('Time [years]')
-            ax1.set_ylabel('Cost of electricity [$/kWh]')
-
-            # Datacenter cost plot
-            ax2 = self.figure.add_subplot(122)
-            lines = []
-            for case in range(n_case):
-                line1 = ax2.plot(month_numbers/12,
-                                 np.cumsum(total_cost_m[case]/1e3),
-                                 label=case_name[case],
-                                 color=cmap(case/(n_case-1) - 0.1))
-                lines = lines + line1
-            ax2.set_xlabel('Time [years]')
-            ax2.set_ylabel('Cost of data center [k$]')
-
-            # Optional secondary plot
-            if self.secondary_plot.get() != "None":
-                ax3 = ax2.twinx()
-                ax3.spines['right'].set_visible(True)
-
-                for case in range(n_case):
-                    if self.secondary_plot.get() == "Electricity consumption":
-                        line2 = ax3.plot(
-                            month_numbers/12,
-                            elec_consumption[case]/1e3, '-',
-                            label=case_name[case] + ' - Electricity',
-                            color=cmap_2(case/(n_case) - 0.2))
-                        ax3.set_ylabel(
-                            'Monthly electricity consumption [MWh]',
-                            rotation=-90)
-                        ax3.yaxis.labelpad = 20
-
-                    elif self.secondary_plot.get() == "Electricity costs":
-                        line2 = ax3.plot(month_numbers/12,
-                                         np.cumsum(
-                                             (IT_cost_m[case] +
-                                              cooling_cost_evap_m[case])
-                                             / 1e3), '-.',
-                                         label=case_name[case] +
-                                         ' - Electricity',
-                                         color=cmap_2(case/(n_case) - 0.2))
-                        ax3.set_ylabel(
-                            'Cost of electricity [k$]', rotation=-90)
-                        ax3.yaxis.labelpad = 20
-
-                    elif self.secondary_plot.get() == "Cooling costs":
-                        line2 = ax3.plot(month_numbers/12,
-                                         np.cumsum(
-                                             cooling_cost_evap_m[case]/1e3),
-                                         '-.',
-                                         label=case_name[case] +
-                                         ' - Cooling',
-                                         color=cmap_2(case/(n_case) - 0.2))
-                        ax3.set_ylabel('Cooling costs [k$]', rotation=-90)
-                        ax3.yaxis.labelpad = 20
-
-                    elif self.secondary_plot.get() == "Maintenance costs":
-                        line2 = ax3.plot(month_numbers/12,
-                                         np.cumsum(
-                                             maintenance_cost_year_m[case] /
-                                             1e3),
-                                         '-.',
-                                         label=case_name[case] +
-                                         ' - Maintenance',
-                                         color=cmap_2(case/(n_case) - 0.2))
-                        ax3.set_ylabel('Maintenance costs [k$]', rotation=-90)
-                        ax3.yaxis.labelpad = 20
-
-                    elif self.secondary_plot.get() == "Capital costs":
-                        line2 = ax3.plot(month_numbers/12,
-                                         np.cumsum(
-                                             capital_cost_m[case]/1e3),
-                                         '-.',
-                                         label=case_name[case] +
-                                         ' - Capex',
-                                         color=cmap_2(case/(n_case) - 0.2))
-                        ax3.set_ylabel('Capital costs [k$]', rotation=-90)
-                        ax3.yaxis.labelpad = 20
-                    lines = lines + line2
-
-            if self.secondary_plot.get() == "Electricity consumption":
-                ax2.legend(handles=lines, loc='center left')
-            else:
-                ax2.legend(handles=lines, loc='best')
-
-        elif self.secondary_plot.get() == "Stackplot":
-            ax1 = self.figure.add_subplot(121)
-            ax2 = self.figure.add_subplot(122)
-            ax1.set_xlabel('Time [years]')
-            ax1.set_ylabel('Cost decomposition of ' +
-                           str(case_name[0])+' [k$]')
-            ax2.set_xlabel('Time [years]')
-            ax2.set_ylabel('Cost decomposition of ' +
-                           str(case_name[1])+' [k$]',
-                           rotation=-90)
-
-            stack0 = np.vstack([np.cumsum(
-                IT_cost_m[0]/1e3), np.cumsum(
-                    cooling_cost_evap_m[0])
-                / 1e3, np.cumsum(
-                maintenance_cost_year_m[0]/1e3), np.cumsum(
-                capital_cost_m[0]/1e3)])
-            stack1 = np.vstack([np.cumsum(
-                IT_cost_m[1]/1e3), np.cumsum(
-                    cooling_cost_evap_m[1])
-                / 1e3, np.cumsum(
-                maintenance_cost_year_m[1]/1e3), np.cumsum(
-                capital_cost_m[1]/1e3)])
-
-            labels = ['IT', 'Cooling', 'Maintenance',
-                      'Capital costs']
-
-            line1 = ax1.stackplot(month_numbers/12,
-                                  stack0, colors=[cmap(1/5), cmap(2/5),
-                                                  cmap(3/5), cmap(4/5)],
-                                  labels=labels)
-            line2 = ax2.stackplot(month_numbers/12,
-                                  stack1, colors=[cmap(1/5), cmap(2/5),
-                                                  cmap(3/5), cmap(4/5)],
-                                  labels=labels)
-
-            ax1.legend(loc='upper left')
-            ax1.set_ylim([0, 1e-3*np.max([np.max(np.cumsum(total_cost_m[0])),
-                                          np.max(np.cumsum(total_cost_m[1]))])
-                          ])
-            ax2.set_ylim([0, 1e-3 * np.max([np.max(np.cumsum(total_cost_m[0])),
-                                            np.max(np.cumsum(total_cost_m[1]))]
-                                           )
-                          ])
-            ax2.yaxis.set_label_position("right")
-            ax2.spines['left'].set_visible(False)
-            ax2.spines['right'].set_visible(True)
-            ax2.yaxis.labelpad = 10
-            ax2.yaxis.tick_right()
-
-        elif self.secondary_plot.get() == "Stackplot without IT":
-            ax1 = self.figure.add_subplot(121)
-            ax2 = self.figure.add_subplot(122)
-            ax1.set_xlabel('Time [years]')
-            ax1.set_ylabel('Cost decomposition of ' +
-                           str(case_name[0])+' [k$]')
-            ax2.set_xlabel('Time [years]')
-            ax2.set_ylabel('Cost decomposition of ' +
-                           str(case_name[1])+' [k$]',
-                           rotation=-90)
-
-            stack0 = np.vstack([np.cumsum(
-                cooling_cost_evap_m[0])
-                / 1e3, np.cumsum(
-                maintenance_cost_year_m[0]/1e3), np.cumsum(
-                capital_cost_m[0]/1e3)])
-            stack1 = np.vstack([np.cumsum(
-                cooling_cost_evap_m[1])
-                / 1e3, np.cumsum(
-                maintenance_cost_year_m[1]/1e3), np.cumsum(
-                capital_cost_m[1]/1e3)])
-
-            labels = ['Cooling', 'Maintenance',
-                      'Capital costs']
-
-            line1 = ax1.stackplot(month_numbers/12,
-                                  stack0, colors=[cmap(2/5),
-                                                  cmap(3/5), cmap(4/5)],
-                                  labels=labels)
-            line2 = ax2.stackplot(month_numbers/12,
-                                  stack1, colors=[cmap(2/5),
-                                                  cmap(3/5), cmap(4/5)],
-                                  labels=labels)
-
-            ax1.legend(loc='upper left')
-            max_y = 1e-3*np.max([np.max(np.cumsum(total_cost_m[0]-IT_cost_m[0]
-                                                  )),
-                                 np.max(np.cumsum(total_cost_m[1]-IT_cost_m[1]
-                                                  ))])
-            ax1.set_ylim([0, max_y])
-            ax2.set_ylim([0, max_y])
-            ax2.yaxis.set_label_position("right")
-            ax2.spines['left'].set_visible(False)
-            ax2.spines['right'].set_visible(True)
-            ax2.yaxis.labelpad = 15
-            ax2.yaxis.tick_right()
+        # Compute all cases at once, or reload the run if already stored
+        results = self.store.compute(
+            self.engine, state_name=state_name, sim_time_y=sim_time_y,
+            n_rack=n_rack, rack_consumption=rack_consumption,
+            case_name=case_name, PUE=PUE, lifetime_y=lifetime_y,
+            installation_init_cost=installation_init_cost,
+            renewal_cost=renewal_cost, maintenance_rate=maintenance_rate,
+            interest_rate=interest_rate, price_type=price_type)
+
+        self.plot(results, case_name, state_name, price_type)
+
+        with TEA_profiling.stage('canvas drawing'):
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            self.plots = FigureCanvasTkAgg(self.figure, root)
+            self.plots.draw()
+            self.plots.get_tk_widget().pack(side=tk.BOTTOM)
+
+        # Prices and activity hours of the run, reused by the sliders
+        self.live = {'state_name': state_name, 'price_type': price_type,
+                     'case_name': case_name,
+                     'secondary_plot': self.secondary_plot.get(),
+                     'electricity_price': results['electricity_price'],
+                     'activity_hours': self.engine.compute_activity_hours(
+                         len(results['month_numbers'])),
+                     'month_numbers': results['month_numbers'],
+                     'n_rack': n_rack,
+                     'installation_init_cost': installation_init_cost,
+                     'renewal_cost': renewal_cost,
+                     'maintenance_rate': maintenance_rate,
+                     'inputs': None}
+        menu = self.slider_case_menu['menu']
+        menu.delete(0, 'end')
+        for name in case_name:
+            menu.add_command(label=name, command=lambda name=name:
+                             self.select_slider_case(name))
+        self.select_slider_case(case_name[0])
+
+    @TEA_profiling.profiled('figure building')
+    def plot(self, results, case_name, state_name, price_type):
+        """
+        Builds the figure of a run
+        results: output of TEA_engine.compute
+        case_name: list of case names
+        state_name: Name of the U.S. state (string)
+        price_type: 'Future' or 'Present'
+        """
+        plt = pyplot()
+        self.figure = plt.Figure(figsize=FIGURE_SIZE, dpi=150)
+        draw_run(self.figure, results, case_name, state_name, price_type,
+                 self.secondary_plot.get())
+
+    def select_slider_case(self, name):
+        """
+        Moves the sliders to the inputs of a case of the last run
+        The range of a slider is widened to the entry value if needed, so
+        that the value is not clamped.
+        """
+        self.slider_case.set(name)
+        case = self.live['case_name'].index(name)
+        for key, label, low, high, resolution, per_case in SLIDERS:
+            values = self.custom_parser(getattr(self, key).get(), 'float')
+            value = values[case] if per_case else values[0]
+            self.sliders[key].config(state=tk.NORMAL, from_=min(low, value),
+                                     to=max(high, value))
+            self.sliders[key].set(value)
+            self.slider_positions[key] = self.sliders[key].get()
+        self.live['inputs'] = self.slider_inputs(update_entries=False)
+
+    def slider_inputs(self, update_entries=True):
+        """
+        Returns the inputs set by the sliders
+        update_entries: also write them in the entries, so that Run
+                        computes the same inputs
+        Sliders which did not move keep the exact entry value, which their
+        resolution would round.
+        """
+        case = self.live['case_name'].index(self.slider_case.get())
+        inputs = {}
+        for name, label, low, high, resolution, per_case in SLIDERS:
+            entry = getattr(self, name)
+            values = self.custom_parser(entry.get(), 'float')
+            position = self.sliders[name].get()
+            if position != self.slider_positions[name]:
+                self.slider_positions[name] = position
+                if per_case:
+                    values[case] = position
+                else:
+                    values = [position]
+                if update_entries:
+                    entry.delete(0, tk.END)
+                    entry.insert(0, ', '.join('%.12g' % value
+                                              for value in values))
+            inputs[name] = values if per_case else values[0]
+        return inputs
+
+    def slider_moved(self, value):
+        """
+        Schedules a live update, at most one every live_interval ms
+        """
+        if self.live is not None and self.live_pending is None:
+            self.live_pending = self.win.after(self.live_interval,
+                                               self.live_update)
+
+    @TEA_profiling.profiled('live update')
+    def live_update(self):
+        """
+        Re-evaluates the last run with the slider inputs and redraws it
+        Only the cost model runs on the stored prices and activity hours,
+        and the lines of the figure are updated in place. The interval
+        between updates follows the drawing time, so that the events of
+        the window are still processed while dragging.
+        """
+        self.live_pending = None
+        inputs = self.slider_inputs()
+        if inputs == self.live['inputs']:
+            return
+        self.live['inputs'] = inputs
+        live = self.live
+        price_type = live['price_type']
+        interest_rate = 0 if price_type == 'Future' else \
+            inputs['interest_rate']/100
+
+        start = time.perf_counter()
+        results = self.engine.compute_costs(
+            live['electricity_price'], live['activity_hours'],
+            live['n_rack']*inputs['rack_consumption'], inputs['PUE'],
+            inputs['lifetime'], live['installation_init_cost'],
+            live['renewal_cost'], live['maintenance_rate'], interest_rate)
+        results['month_numbers'] = live['month_numbers']
+        results['electricity_price'] = live['electricity_price']
+        results['interest_rate'] = interest_rate
+
+        if live['secondary_plot'] in REBUILT_PLOTS:
+            self.figure.clear()
+            draw_run(self.figure, results, live['case_name'],
+                     live['state_name'], price_type, live['secondary_plot'])
+        else:
+            update_run(self.figure, results, live['case_name'],
+                       live['state_name'], price_type,
+                       live['secondary_plot'])
+        self.plots.draw()
+        self.live_interval = max(LIVE_INTERVAL, int(
+            2e3*(time.perf_counter() - start)))
 
     def save_results(self):
         """
@@ -511,3 +451,8 @@ if __name__ == "__main__":
     root = tk.Tk()
     TEA_interface(root)
     root.mainloop()
+
+    # Instrumentation switched on with the TEA_PROFILE environment variable
+    if TEA_profiling.enabled:
+        TEA_profiling.print_summary()
+        TEA_profiling.export_chrome_trace('tea_trace.json')
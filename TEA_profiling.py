@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import threading
+import functools
+import tracemalloc
+
+
+# Instrumentation switch, checked on every instrumented call
+enabled = False
+track_allocations = False
+
+# Recorded stages, as Chrome trace complete events
+events = []
+
+# Allocation frames of the stages being recorded: [start, peak] (bytes),
+# one stack per thread as stages nest within a thread only
+thread_state = threading.local()
+allocation_stacks = []
+
+
+def thread_allocations():
+    """
+    Returns the allocation frames of the current thread
+    """
+    stack = getattr(thread_state, 'allocations', None)
+    if stack is None:
+        stack = thread_state.allocations = []
+        allocation_stacks.append(stack)
+    return stack
+
+
+def enable(allocations=False):
+    """
+    Starts recording the instrumented stages
+    allocations: also record the memory allocated by each stage, through
+                 tracemalloc (slows the instrumented code down)
+    """
+    global enabled, track_allocations
+    track_allocations = allocations
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    enabled = True
+
+
+def disable():
+    """
+    Stops recording, the recorded stages are kept
+    """
+    global enabled, track_allocations
+    if track_allocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    enabled = False
+    track_allocations = False
+
+
+def reset():
+    """
+    Forgets the recorded stages
+    """
+    del events[:]
+    for stack in allocation_stacks:
+        del stack[:]
+
+
+class Stage:
+    """
+    Context manager recording the wall time of a stage
+    """
+
+    def __init__(self, name, args=None):
+        self.name = name
+        self.args = {} if args is None else args
+
+    def __enter__(self):
+        if track_allocations:
+            frames = thread_allocations()
+            current, peak = tracemalloc.get_traced_memory()
+            if frames:
+                frames[-1][1] = max(frames[-1][1], peak)
+            tracemalloc.reset_peak()
+            frames.append([current, current])
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        args = dict(self.args)
+        frames = thread_allocations()
+        if track_allocations and frames:
+            current, peak = tracemalloc.get_traced_memory()
+            start, stage_peak = frames.pop()
+            stage_peak = max(stage_peak, peak)
+            tracemalloc.reset_peak()
+            if frames:
+                frames[-1][1] = max(frames[-1][1], stage_peak)
+            args['allocated_bytes'] = current - start
+            args['peak_bytes'] = stage_peak - start
+        events.append({'name': self.name, 'ph': 'X',
+                       'ts': self.start/1e3, 'dur': (end - self.start)/1e3,
+                       'pid': os.getpid(), 'tid': threading.get_ident(),
+                       'args': args})
+        return False
+
+
+class NoStage:
+    """
+    Context manager doing nothing, used while the instrumentation is off
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+no_stage = NoStage()
+
+
+def stage(name, **args):
+    """
+    Returns a context manager recording the enclosed stage when enabled
+    name: name of the stage in the trace
+    args: extra values shown with the stage in the trace
+    """
+    if enabled:
+        return Stage(name, args)
+    return no_stage
+
+
+def profiled(name):
+    """
+    Decorator recording every call of a function as a stage when enabled
+    name: name of the stage in the trace
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+            with Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    Returns the calls, wall time (s) and allocations of each stage
+    """
+    stages = {}
+    for event in events:
+        record = stages.setdefault(event['name'], {
+            'calls': 0, 'total_s': 0., 'max_s': 0.})
+        record['calls'] += 1
+        record['total_s'] += event['dur']/1e6
+        record['max_s'] = max(record['max_s'], event['dur']/1e6)
+        if 'allocated_bytes' in event['args']:
+            record['allocated_bytes'] = record.get('allocated_bytes', 0) + \
+                event['args']['allocated_bytes']
+            record['peak_bytes'] = max(record.get('peak_bytes', 0),
+                                       event['args']['peak_bytes'])
+    for record in stages.values():
+        record['mean_s'] = record['total_s']/record['calls']
+    return stages
+
+
+def print_summary():
+    """
+    Prints the summary of the recorded stages, slowest first
+    """
+    stages = sorted(summary().items(), key=lambda item: -item[1]['total_s'])
+    print('%-32s %8s %12s %12s %12s' % ('Stage', 'Calls', 'Total (ms)',
+                                        'Mean (ms)', 'Peak (kB)'))
+    for name, record in stages:
+        print('%-32s %8d %12.3f %12.3f %12s' % (
+            name, record['calls'], 1e3*record['total_s'],
+            1e3*record['mean_s'],
+            '%.1f' % (record['peak_bytes']/1e3) if 'peak_bytes' in record
+            else '-'))
+
+
+def export_chrome_trace(path):
+    """
+    Writes the recorded stages as a Chrome trace JSON file, to open in
+    chrome://tracing or https://ui.perfetto.dev
+    path: path of the trace file
+    """
+    with open(path, 'w') as file:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+
+# Instrumentation switched on from the environment, e.g. TEA_PROFILE=1
+if os.environ.get('TEA_PROFILE', '0') not in ['', '0']:
+    enable(allocations=os.environ.get('TEA_PROFILE') == 'allocations')
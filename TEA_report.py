@@ -0,0 +1,398 @@
+import os
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from TEA_engine import TEA_engine
+import TEA_profiling
+from TEA_compare import compare_cases, case_color, plot_small_multiples, \
+    plot_delta_matrix
+
+
+STATES = ["United States", "Alabama", "Alaska", "Arizona",
+          "Arkansas", "California", "Colorado", "Connecticut",
+          "Delaware", "Florida", "Georgia", "Hawaii",
+          "Idaho", "Illinois", "Indiana", "Iowa", "Kansas",
+          "Kentucky", "Louisiana", "Maine", "Maryland",
+          "Massachusetts", "Michigan", "Minnesota",
+          "Mississippi", "Missouri", "Montana", "Nebraska",
+          "Nevada", "New Hampshire", "New Jersey", "New Mexico",
+          "New York", "North Carolina", "North Dakota",
+          "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
+          "Rhode Island", "South Carolina", "South Dakota",
+          "Tennessee", "Texas", "Utah", "Vermont", "Virginia",
+          "Washington", "West Virginia", "Wisconsin", "Wyoming"]
+
+PLOT_TYPES = ["None", "Electricity consumption",
+              "Electricity costs", "Cooling costs",
+              "Maintenance costs", "Capital costs",
+              "Stackplot", "Stackplot without IT",
+              "Cost differences"]
+
+# Plotting default parameters
+STYLE = {'font.size': '10', 'legend.fontsize': '7',
+         'font.sans-serif': 'Helvetica', 'font.family': 'sans-serif',
+         'axes.spines.right': False, 'axes.spines.top': False}
+
+FIGURE_SIZE = (8.3, 4)
+
+# Cumulative secondary plots: summed components and line label suffix
+SECONDARY_LINES = {
+    "Electricity costs": (['IT_cost_m', 'cooling_cost_evap_m'],
+                          ' - Electricity'),
+    "Cooling costs": (['cooling_cost_evap_m'], ' - Cooling'),
+    "Maintenance costs": (['maintenance_cost_year_m'], ' - Maintenance'),
+    "Capital costs": (['capital_cost_m'], ' - Capex')}
+
+SECONDARY_LABELS = {
+    "Electricity consumption": 'Monthly electricity consumption [MWh]',
+    "Electricity costs": 'Cost of electricity [k$]',
+    "Cooling costs": 'Cooling costs [k$]',
+    "Maintenance costs": 'Maintenance costs [k$]',
+    "Capital costs": 'Capital costs [k$]'}
+
+# Plot types drawn as small multiples or matrices, rebuilt for each page
+REBUILT_PLOTS = ["Stackplot", "Stackplot without IT", "Cost differences"]
+
+# Engine and reused figure of the report workers, with the layout drawn
+# on the figure
+worker_engine = None
+worker_figure = None
+worker_layout = None
+
+
+def draw_run(figure, results, case_name, state_name, price_type,
+             secondary_plot='None'):
+    """
+    Draws the figure of a run
+    figure: empty matplotlib figure
+    results: output of TEA_engine.compute
+    case_name: list of case names
+    state_name: Name of the U.S. state (string)
+    price_type: 'Future' or 'Present'
+    secondary_plot: one of PLOT_TYPES
+    """
+    import matplotlib.pyplot as plt
+    n_case = len(case_name)
+    month_numbers = results['month_numbers']
+
+    figure.suptitle("Datacenter TEA for "+state_name)
+    cmap = plt.get_cmap('viridis')
+
+    if secondary_plot == "Stackplot":
+        plot_small_multiples(figure, results, case_name)
+
+    elif secondary_plot == "Stackplot without IT":
+        plot_small_multiples(figure, results, case_name, with_IT=False)
+
+    elif secondary_plot == "Cost differences":
+        ax1 = figure.add_subplot(121)
+        ax2 = figure.add_subplot(122)
+        comparison = compare_cases(results, case_name)
+        for case in comparison['ranking']:
+            ax1.plot(month_numbers/12,
+                     comparison['cumulative'][case] -
+                     comparison['cumulative'][comparison['ranking'][0]],
+                     label=case_name[case],
+                     color=case_color(cmap, case, n_case))
+        ax1.legend(loc='best')
+        ax1.set_xlabel('Time [years]')
+        ax1.set_ylabel('Extra cost vs. ' +
+                       case_name[comparison['ranking'][0]] + ' [$]')
+        plot_delta_matrix(ax2, comparison)
+
+    else:
+        years, series = line_series(results, case_name, price_type,
+                                    secondary_plot)
+        # Cost of electricity plot
+        ax1 = figure.add_subplot(121)
+        ax1.set_xlabel('Time [years]')
+        ax1.set_ylabel('Cost of electricity [$/kWh]')
+
+        # Datacenter cost plot
+        ax2 = figure.add_subplot(122)
+        ax2.set_xlabel('Time [years]')
+        ax2.set_ylabel('Cost of data center [k$]')
+        axes = [ax1, ax2]
+
+        # Optional secondary plot
+        if secondary_plot != "None":
+            ax3 = ax2.twinx()
+            ax3.spines['right'].set_visible(True)
+            ax3.set_ylabel(SECONDARY_LABELS[secondary_plot], rotation=-90)
+            ax3.yaxis.labelpad = 20
+            axes.append(ax3)
+
+        for axis, values, style in series:
+            axes[axis].plot(years, values, **style)
+        ax1.legend()
+        lines = [line for ax in axes[1:] for line in ax.lines]
+        if secondary_plot == "Electricity consumption":
+            ax2.legend(handles=lines, loc='center left')
+        else:
+            ax2.legend(handles=lines, loc='best')
+
+
+def line_series(results, case_name, price_type, secondary_plot):
+    """
+    Lines of the standard figure of a run
+    Returns the time axis (years) and the list of (axes, values, style) of
+    the lines, axes 0: electricity prices, 1: cumulative costs,
+    2: secondary plot
+    """
+    import matplotlib.pyplot as plt
+    cmap = plt.get_cmap('viridis')
+    cmap_2 = plt.get_cmap('hot')
+    n_case = len(case_name)
+    month_numbers = results['month_numbers']
+    electricity_price = results['electricity_price']
+
+    series = [(0, electricity_price, {'label': 'Electricity costs'})]
+    if price_type == 'Present':
+        series.append((0, electricity_price*(
+            1 + results['interest_rate']/12)**(-month_numbers),
+            {'label': 'Prices corrected with interest rate'}))
+    for case in range(n_case):
+        series.append((1, np.cumsum(results['total_cost_m'][case]/1e3),
+                       {'label': case_name[case],
+                        'color': case_color(cmap, case, n_case)}))
+    if secondary_plot == "Electricity consumption":
+        for case in range(n_case):
+            series.append((2, results['elec_consumption'][case]/1e3,
+                           {'label': case_name[case] + ' - Electricity',
+                            'color': cmap_2(case/(n_case) - 0.2),
+                            'linestyle': '-'}))
+    elif secondary_plot != "None":
+        components, suffix = SECONDARY_LINES[secondary_plot]
+        for case in range(n_case):
+            series.append((2, np.cumsum(sum(
+                results[component][case] for component in components)/1e3),
+                {'label': case_name[case] + suffix,
+                 'color': cmap_2(case/(n_case) - 0.2), 'linestyle': '-.'}))
+    return month_numbers/12, series
+
+
+def update_run(figure, results, case_name, state_name, price_type,
+               secondary_plot='None'):
+    """
+    Redraws a standard figure built by draw_run with the same case names,
+    price type and secondary plot on new results, keeping its axes,
+    ticks and legends
+    """
+    years, series = line_series(results, case_name, price_type,
+                                secondary_plot)
+    figure.suptitle("Datacenter TEA for "+state_name)
+    lines = [iter(ax.lines) for ax in figure.axes]
+    for axis, values, style in series:
+        next(lines[axis]).set_data(years, values)
+    for ax in figure.axes:
+        ax.relim()
+        ax.autoscale_view()
+
+
+def compute_scenario(engine, scenario):
+    """
+    Computes a report scenario
+    scenario: dict of the arguments of TEA_engine.compute with 'case_name'
+    Returns the results and the case names
+    """
+    parameters = dict(scenario)
+    case_name = parameters.pop('case_name')
+    return engine.compute(**parameters), case_name
+
+
+def page_name(index, scenario, secondary_plot):
+    """
+    File name of a report page
+    """
+    name = '%03d_tea_for_%s' % (index, scenario['state_name'])
+    if secondary_plot != 'None':
+        name += '_' + secondary_plot
+    return name.replace(' ', '_') + '.png'
+
+
+def init_worker(engine_options=None):
+    """
+    Loads the input data once in each report worker, without display
+    engine_options: keyword arguments of TEA_engine, see engine_options
+    """
+    global worker_engine
+    import matplotlib
+    matplotlib.use('Agg')
+    worker_engine = TEA_engine(**(engine_options or {}))
+
+
+def engine_options(engine):
+    """
+    Returns the arguments building an engine like the given one in the
+    worker processes: input files, precision and activity model
+    """
+    return {'price_file': engine.price_file,
+            'activity_file': engine.activity_file,
+            'precision': engine.dtype.name,
+            'cache_file': engine.cache_file,
+            'activity': engine.activity_option}
+
+
+def figure_template(layout=None):
+    """
+    Returns the figure of the process with its Agg canvas, and whether it
+    already holds the layout
+    layout: hashable description of the page layout, None if the page is
+            always rebuilt
+    Pages of the same layout only update the data of the lines, which
+    avoids rebuilding the axes, ticks and legends of every page.
+    """
+    global worker_figure, worker_layout
+    if worker_figure is None:
+        import matplotlib.pyplot as plt
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        plt.rcParams.update(STYLE)
+        worker_figure = Figure(figsize=FIGURE_SIZE)
+        FigureCanvasAgg(worker_figure)
+    if layout is not None and layout == worker_layout:
+        return worker_figure, True
+    worker_figure.clear()
+    worker_layout = layout
+    return worker_figure, False
+
+
+def draw_page(engine, scenario, secondary_plot):
+    """
+    Computes a scenario and draws it on the figure template
+    """
+    results, case_name = compute_scenario(engine, scenario)
+    price_type = scenario.get('price_type', 'Future')
+    layout = None
+    if secondary_plot not in REBUILT_PLOTS:
+        layout = (secondary_plot, price_type, tuple(case_name))
+    figure, reuse = figure_template(layout)
+    draw = update_run if reuse else draw_run
+    draw(figure, results, case_name, scenario['state_name'], price_type,
+         secondary_plot)
+    return figure
+
+
+def render_pages(pages, directory=None, dpi=150, engine=None):
+    """
+    Renders report pages with the process engine and figure template
+    pages: list of (index, scenario, secondary_plot)
+    directory: where PNG pages are written, if None the pages are returned
+               as (height, width, 4) RGBA arrays
+    dpi: resolution of the pages
+    engine: TEA_engine instance, the worker engine if None
+    Returns the list of file paths or of images
+    """
+    engine = engine or worker_engine
+    rendered = []
+    for index, scenario, secondary_plot in pages:
+        figure = draw_page(engine, scenario, secondary_plot)
+        if directory is None:
+            figure.set_dpi(dpi)
+            figure.canvas.draw()
+            rendered.append(np.asarray(figure.canvas.buffer_rgba()).copy())
+        else:
+            path = os.path.join(directory,
+                                page_name(index, scenario, secondary_plot))
+            figure.savefig(path, dpi=dpi)
+            rendered.append(path)
+    return rendered
+
+
+@TEA_profiling.profiled('report')
+def render_report(scenarios, output, secondary_plots=('None',), dpi=150,
+                  n_workers=None, engine=None):
+    """
+    Renders one page per scenario and secondary plot, without display
+    scenarios: list of dicts of the arguments of TEA_engine.compute with
+               'case_name'
+    output: path of a multi-page .pdf file, or directory of .png pages
+    secondary_plots: plot types among PLOT_TYPES drawn for each scenario
+    dpi: resolution of the pages
+    n_workers: number of worker processes, all cores if None, 0 to render
+               in this process (vector pdf pages)
+    engine: TEA_engine instance used when rendering in this process, the
+            worker processes load an engine with the same input files,
+            precision and activity model. A default engine if None.
+    Returns the list of written files
+    """
+    pages = [(index, scenario, secondary_plot)
+             for index, scenario in enumerate(scenarios)
+             for secondary_plot in secondary_plots]
+    pdf = output.lower().endswith('.pdf')
+    directory = None if pdf else output
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    n_workers = min(n_workers, len(pages))
+
+    if n_workers == 0:
+        engine = engine or TEA_engine()
+        if not pdf:
+            return render_pages(pages, directory, dpi, engine)
+        from matplotlib.backends.backend_pdf import PdfPages
+        with PdfPages(output) as document:
+            for index, scenario, secondary_plot in pages:
+                document.savefig(draw_page(engine, scenario, secondary_plot),
+                                 dpi=dpi)
+        return [output]
+
+    # Contiguous chunks, several per worker to balance the load
+    n_chunk = min(len(pages), 4*n_workers)
+    chunks = [list(chunk) for chunk in np.array_split(
+        np.arange(len(pages)), n_chunk)]
+    # The spawn context starts clean interpreters, without the state of a
+    # calling GUI or service
+    with ProcessPoolExecutor(
+            n_workers, multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(None if engine is None else engine_options(engine),)
+    ) as pool:
+        futures = [pool.submit(render_pages, [pages[k] for k in chunk],
+                               directory, dpi) for chunk in chunks]
+        if not pdf:
+            return [path for future in futures for path in future.result()]
+
+        # Pages drawn by the workers are assembled in order
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_pdf import PdfPages
+        with PdfPages(output) as document:
+            for future in futures:
+                for image in future.result():
+                    page = Figure(figsize=(image.shape[1]/dpi,
+                                           image.shape[0]/dpi), dpi=dpi)
+                    page.figimage(image, resize=False)
+                    document.savefig(page, dpi=dpi)
+    return [output]
+
+
+if __name__ == "__main__":
+    from TEA_service import DEFAULT_SCENARIO
+    parser = argparse.ArgumentParser(description='Batch TEA reports')
+    parser.add_argument('output', help='.pdf file or directory of .png')
+    parser.add_argument('--states', nargs='+', default=STATES[1:],
+                        help='states of the report, every state by default')
+    parser.add_argument('--plots', nargs='+', default=['None'],
+                        choices=PLOT_TYPES, help='secondary plots')
+    parser.add_argument('--price-type', default=DEFAULT_SCENARIO[
+        'price_type'], choices=['Future', 'Present'])
+    parser.add_argument('--years', type=float,
+                        default=DEFAULT_SCENARIO['sim_time_y'])
+    parser.add_argument('--dpi', type=int, default=150)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes, 0 to render inline')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scenarios = [dict(DEFAULT_SCENARIO, state_name=state,
+                      price_type=args.price_type, sim_time_y=args.years)
+                 for state in args.states]
+    files = render_report(scenarios, args.output, args.plots, args.dpi,
+                          args.workers)
+    print('%d pages written to %d files in %.1f s' % (
+        len(scenarios)*len(args.plots), len(files),
+        time.perf_counter() - start))
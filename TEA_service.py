@@ -0,0 +1,484 @@
+import json
+import sys
+import math
+import time
+import asyncio
+import argparse
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from TEA_engine import TEA_engine, COMPONENTS
+import TEA_profiling
+
+
+# Inputs of a scenario, as for TEA_engine.compute
+SCENARIO_KEYS = ['state_name', 'sim_time_y', 'n_rack', 'rack_consumption',
+                 'PUE', 'lifetime_y', 'installation_init_cost',
+                 'renewal_cost', 'maintenance_rate', 'interest_rate']
+
+# Inputs given as one number per case
+CASE_KEYS = ['PUE', 'lifetime_y', 'installation_init_cost', 'renewal_cost',
+             'maintenance_rate']
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+# Engine of the process pool workers
+worker_engine = None
+
+
+def init_worker():
+    """
+    Loads the input data once in each process pool worker
+    """
+    global worker_engine
+    worker_engine = TEA_engine()
+
+
+def evaluate_in_worker(scenarios):
+    """
+    Evaluates a batch in a process pool worker, on the latest valid input
+    data
+    """
+    try:
+        worker_engine.reload()
+    except Exception:
+        # The service reports invalid input files, the loaded data is kept
+        pass
+    return evaluate_batch(worker_engine, scenarios)
+
+
+def check_scenario(scenario):
+    """
+    Validates a scenario and fills its defaults, raises ValueError if invalid
+    scenario: dict decoded from the request body
+    """
+    if not isinstance(scenario, dict):
+        raise ValueError('A scenario must be a JSON object')
+    missing = [key for key in SCENARIO_KEYS if key not in scenario]
+    if missing:
+        raise ValueError('Missing scenario keys: ' + ', '.join(missing))
+    scenario = dict(scenario)
+    scenario.setdefault('price_type', 'Future')
+    scenario.setdefault('sector', 'industrial')
+    scenario.setdefault('arrays', True)
+    for key in ['state_name', 'sector']:
+        if not isinstance(scenario[key], str):
+            raise ValueError(key + ' must be a string')
+    if scenario['price_type'] not in ['Future', 'Present']:
+        raise ValueError("price_type must be 'Future' or 'Present'")
+    if not isinstance(scenario['arrays'], bool):
+        raise ValueError('arrays must be true or false')
+
+    # Numbers may be sent as strings, every value is converted here so that
+    # a batch can only hold valid scenarios
+    for key in ['sim_time_y', 'n_rack', 'rack_consumption', 'interest_rate']:
+        scenario[key] = check_number(key, scenario[key])
+    if int(round(12*scenario['sim_time_y'])) < 1:
+        raise ValueError('sim_time_y must cover at least one month')
+    for key in CASE_KEYS:
+        if not isinstance(scenario[key], list) or not scenario[key]:
+            raise ValueError(key + ' must be a non-empty list')
+        scenario[key] = [check_number(key, value) for value in scenario[key]]
+    if min(scenario['lifetime_y'])*12 < 1:
+        raise ValueError('lifetime_y must be at least one month')
+
+    n_case = len(scenario['PUE'])
+    scenario.setdefault('case_name',
+                        ['Case ' + str(case) for case in range(n_case)])
+    if not isinstance(scenario['case_name'], list):
+        raise ValueError('case_name must be a list')
+    scenario['case_name'] = [str(name) for name in scenario['case_name']]
+    for key in ['case_name'] + CASE_KEYS:
+        if len(scenario[key]) != n_case:
+            raise ValueError(key + ' must have one value per case')
+    return scenario
+
+
+def check_number(key, value):
+    """
+    Converts a scenario value to a finite float, raises ValueError if invalid
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(key + ' must be a number, got ' + repr(value))
+    if not math.isfinite(number):
+        raise ValueError(key + ' must be finite')
+    return number
+
+
+@TEA_profiling.profiled('batch evaluation')
+def evaluate_batch(engine, scenarios):
+    """
+    Evaluates many scenarios with one vectorized call per horizon
+    engine: TEA_engine instance
+    scenarios: list of scenarios validated by check_scenario
+    Returns the list of responses, in the order of the scenarios
+    """
+    # Scenarios sharing a horizon, sector and number of cases are stacked
+    groups = {}
+    for index, scenario in enumerate(scenarios):
+        key = (int(round(12*scenario['sim_time_y'])), scenario['sector'],
+               len(scenario['PUE']))
+        groups.setdefault(key, []).append(index)
+
+    responses = [None]*len(scenarios)
+    for (sim_time_m, sector, n_case), indices in groups.items():
+        batch = [scenarios[index] for index in indices]
+
+        def batch_array(key):
+            return np.array([scenario[key] for scenario in batch],
+                            dtype=float)
+
+        prices = engine.electricity_prices(
+            [scenario['state_name'] for scenario in batch], [sector],
+            sim_time_m)[:, 0]
+        interest_rate = np.array(
+            [0 if scenario['price_type'] == 'Future'
+             else scenario['interest_rate'] for scenario in batch],
+            dtype=float)
+        results = engine.compute_costs(
+            prices,
+            engine.compute_activity_hours(sim_time_m),
+            batch_array('n_rack')*batch_array('rack_consumption'),
+            batch_array('PUE'), batch_array('lifetime_y'),
+            batch_array('installation_init_cost'),
+            batch_array('renewal_cost'), batch_array('maintenance_rate'),
+            interest_rate)
+        month_numbers = engine.month_numbers(sim_time_m)
+
+        for position, index in enumerate(indices):
+            scenario = scenarios[index]
+            response = {
+                'case_name': scenario['case_name'],
+                'summary': summarize(
+                    {name: results[name][position] for name in COMPONENTS},
+                    scenario['case_name'])}
+            if scenario['arrays']:
+                response['month_numbers'] = month_numbers.tolist()
+                response['electricity_price'] = prices[position].tolist()
+                for name in COMPONENTS:
+                    response[name] = results[name][position].tolist()
+            responses[index] = response
+    return responses
+
+
+def respond(future, response=None, error=None):
+    """
+    Answers a queued scenario, unless its request was abandoned
+    """
+    if future.done():
+        return
+    if error is None:
+        future.set_result(response)
+    else:
+        future.set_exception(error)
+
+
+def summarize(results, case_name):
+    """
+    Summarizes the cost components of each case over the whole horizon
+    results: dict of (n_case, n_month) arrays keyed by COMPONENTS
+    case_name: list of case names
+    """
+    summary = {}
+    for case, name in enumerate(case_name):
+        summary[name] = {
+            component: float(results[component][case].sum(dtype=np.float64))
+            for component in COMPONENTS}
+    return summary
+
+
+class TEA_service:
+    """
+    Local HTTP/JSON service answering TEA evaluations
+
+    POST /compute with a scenario (or a list of scenarios) as JSON body,
+    GET /health to check the service
+    """
+
+    def __init__(self, engine=None, batch_window=0.005, max_batch=256,
+                 heavy_cells=2e6, n_workers=None, reload_interval=1.):
+        """
+        engine: TEA_engine instance, loaded if not given
+        batch_window: time (s) during which requests are gathered in a batch
+        max_batch: maximum number of scenarios per batch
+        heavy_cells: batches with more (scenario x case x month) cells are
+                     dispatched to the process pool
+        n_workers: number of pool processes, 0 to always compute inline
+        reload_interval: time (s) between checks of the input files, which
+                         are reloaded when they change
+        """
+        self.engine = TEA_engine() if engine is None else engine
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.heavy_cells = heavy_cells
+        self.n_workers = n_workers
+        self.reload_interval = reload_interval
+        self.last_check = time.monotonic()
+        self.reload_error = None
+        self.pool = None
+        self.queue = None
+        self.server = None
+        self.batcher = None
+
+    async def start(self, host='127.0.0.1', port=8050):
+        """
+        Starts listening, returns the bound port
+        """
+        self.queue = asyncio.Queue()
+        if self.n_workers != 0:
+            # Forking next to the pool threads can deadlock, spawn instead
+            self.pool = ProcessPoolExecutor(
+                self.n_workers, multiprocessing.get_context('spawn'),
+                initializer=init_worker)
+        self.batcher = asyncio.create_task(self.run_batches())
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stops the server, the batcher and the process pool
+        """
+        self.server.close()
+        await self.server.wait_closed()
+        self.batcher.cancel()
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    async def evaluate(self, scenarios):
+        """
+        Queues scenarios for the next batch and waits for their responses
+        """
+        loop = asyncio.get_running_loop()
+        futures = []
+        for scenario in scenarios:
+            future = loop.create_future()
+            await self.queue.put((scenario, future))
+            futures.append(future)
+        return await asyncio.gather(*futures)
+
+    async def run_batches(self):
+        """
+        Gathers the queued scenarios and evaluates them together
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(
+                        self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                responses = await self.dispatch(
+                    [scenario for scenario, future in batch])
+            except Exception:
+                # Only the faulty scenarios of a failed batch get the error
+                for scenario, future in batch:
+                    try:
+                        response = (await self.dispatch([scenario]))[0]
+                    except Exception as error:
+                        respond(future, error=error)
+                    else:
+                        respond(future, response)
+            else:
+                for (scenario, future), response in zip(batch, responses):
+                    respond(future, response)
+
+    async def dispatch(self, scenarios):
+        """
+        Evaluates a batch inline, or in the process pool if it is heavy
+        """
+        cells = sum(len(scenario['PUE'])*12*scenario['sim_time_y']
+                    for scenario in scenarios)
+        if self.pool is not None and cells > self.heavy_cells:
+            return await asyncio.get_running_loop().run_in_executor(
+                self.pool, evaluate_in_worker, scenarios)
+        return evaluate_batch(self.engine, scenarios)
+
+    def check_data(self):
+        """
+        Reloads the changed input files, at most every reload_interval
+        The pool workers check the files before each batch. While a changed
+        file is invalid, the loaded data keeps being served and the error
+        is logged once, and reported by /health.
+        """
+        now = time.monotonic()
+        if now - self.last_check < self.reload_interval:
+            return
+        self.last_check = now
+        try:
+            self.engine.reload()
+        except Exception as error:
+            message = type(error).__name__ + ': ' + str(error)
+            if message != self.reload_error:
+                print('Input data not reloaded, serving data version %s: %s'
+                      % (self.engine.data_version, message), file=sys.stderr)
+            self.reload_error = message
+        else:
+            self.reload_error = None
+
+    async def handle(self, reader, writer):
+        """
+        Answers the HTTP requests of a connection (keep-alive supported)
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path = request_line.decode().split()[:2]
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in [b'\r\n', b'\n', b'']:
+                            break
+                        key, value = line.decode().split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    # Not HTTP, the connection is dropped
+                    break
+                body = await reader.readexactly(length)
+
+                status, response = await self.route(method, path, body)
+                data = json.dumps(response).encode()
+                writer.write(
+                    ('HTTP/1.1 %d %s\r\nContent-Type: application/json\r\n'
+                     'Content-Length: %d\r\n\r\n'
+                     % (status, REASONS[status], len(data))).encode() + data)
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        """
+        Returns the status and JSON response of a request
+        """
+        self.check_data()
+        if path == '/health':
+            return 200, {'status': 'ok',
+                         'data_version': self.engine.data_version,
+                         'reload_error': self.reload_error}
+        if path != '/compute':
+            return 404, {'error': 'Unknown path ' + path}
+        if method != 'POST':
+            return 405, {'error': 'Use POST on /compute'}
+        try:
+            request = json.loads(body)
+            single = isinstance(request, dict)
+            scenarios = [check_scenario(scenario) for scenario in
+                         ([request] if single else request)]
+            # Unknown or empty price series are refused before batching
+            self.engine.electricity_prices(
+                [scenario['state_name'] for scenario in scenarios],
+                list({scenario['sector'] for scenario in scenarios}), 1)
+        except KeyError as error:
+            return 400, {'error': error.args[0]}
+        except (ValueError, TypeError) as error:
+            return 400, {'error': str(error)}
+        try:
+            responses = await self.evaluate(scenarios)
+        except Exception as error:
+            return 500, {'error': str(error)}
+        return 200, responses[0] if single else responses
+
+
+async def request(host, port, scenario):
+    """
+    Posts a scenario to a running service and returns its JSON response
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    data = json.dumps(scenario).encode()
+    writer.write(('POST /compute HTTP/1.1\r\nHost: %s\r\n'
+                  'Content-Type: application/json\r\nContent-Length: %d\r\n'
+                  'Connection: close\r\n\r\n' % (host, len(data))).encode() +
+                 data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+
+async def benchmark(host, port, scenario, n_requests=200, concurrency=50):
+    """
+    Measures the throughput and latency of a running service
+    scenario: scenario posted by every request
+    n_requests: total number of requests
+    concurrency: number of requests in flight
+    Returns a dict of throughput (requests/s) and latencies (ms)
+    """
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed_request():
+        async with semaphore:
+            start = time.perf_counter()
+            await request(host, port, scenario)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[timed_request() for k in range(n_requests)])
+    duration = time.perf_counter() - start
+    latencies = 1e3*np.array(latencies)
+    return {'throughput': n_requests/duration,
+            'latency_mean': float(latencies.mean()),
+            'latency_p50': float(np.percentile(latencies, 50)),
+            'latency_p99': float(np.percentile(latencies, 99))}
+
+
+# Default scenario of the interface, used by the benchmark
+DEFAULT_SCENARIO = {'state_name': 'California', 'sim_time_y': 20,
+                    'n_rack': 42, 'rack_consumption': 10,
+                    'case_name': ['Evaporative', 'Classic'],
+                    'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+                    'installation_init_cost': [48700, 43200],
+                    'renewal_cost': [28288, 24343],
+                    'maintenance_rate': [0.15, 0.19],
+                    'interest_rate': 0.07, 'price_type': 'Present'}
+
+
+async def main(args):
+    if args.profile:
+        TEA_profiling.enable()
+    service = TEA_service(n_workers=args.workers)
+    port = await service.start(args.host, args.port)
+    print('TEA service listening on http://%s:%d' % (args.host, port))
+    if args.bench:
+        print(await benchmark(args.host, port, DEFAULT_SCENARIO,
+                              args.requests, args.concurrency))
+        await service.stop()
+        if args.profile:
+            TEA_profiling.print_summary()
+            TEA_profiling.export_chrome_trace(args.profile)
+    else:
+        await service.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Local TEA service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8050)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='process pool size, 0 to compute inline')
+    parser.add_argument('--bench', action='store_true',
+                        help='benchmark the service against localhost')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--profile', metavar='TRACE',
+                        help='write a Chrome trace of the benchmark')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,231 @@
+import io
+import os
+import json
+import hashlib
+import sqlite3
+import time
+import numpy as np
+
+from TEA_engine import DATA_DIR, COMPONENTS
+import TEA_profiling
+
+
+STORE_FILE = os.path.join(DATA_DIR, 'TEA_runs.sqlite')
+
+# Scalar inputs of TEA_engine.compute, stored as columns of the runs table
+RUN_PARAMETERS = ['state_name', 'sim_time_y', 'n_rack', 'rack_consumption',
+                  'interest_rate', 'price_type', 'sector']
+
+# Per-case inputs of TEA_engine.compute, stored in the cases table
+CASE_PARAMETERS = ['case_name', 'PUE', 'lifetime_y', 'installation_init_cost',
+                   'renewal_cost', 'maintenance_rate']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    param_hash TEXT UNIQUE NOT NULL,
+    data_version TEXT NOT NULL,
+    created REAL NOT NULL,
+    state_name TEXT, sim_time_y REAL, n_rack INTEGER,
+    rack_consumption REAL, interest_rate REAL, price_type TEXT,
+    sector TEXT, parameters TEXT
+);
+CREATE TABLE IF NOT EXISTS cases (
+    run_id INTEGER REFERENCES runs(run_id) ON DELETE CASCADE,
+    case_index INTEGER,
+    case_name TEXT, PUE REAL, lifetime_y REAL,
+    installation_init_cost REAL, renewal_cost REAL, maintenance_rate REAL,
+    total_cost REAL,
+    PRIMARY KEY (run_id, case_index)
+);
+CREATE TABLE IF NOT EXISTS arrays (
+    run_id INTEGER REFERENCES runs(run_id) ON DELETE CASCADE,
+    name TEXT,
+    data BLOB,
+    PRIMARY KEY (run_id, name)
+);
+CREATE INDEX IF NOT EXISTS runs_state ON runs(state_name);
+CREATE INDEX IF NOT EXISTS cases_name ON cases(case_name);
+CREATE VIEW IF NOT EXISTS run_cases AS
+    SELECT * FROM runs JOIN cases USING (run_id);
+"""
+
+
+def parameter_hash(parameters, data_version):
+    """
+    Hashes a scenario together with the version of the input data
+    parameters: dict of the inputs of TEA_engine.compute and 'case_name'
+    data_version: version string of the input data
+    """
+    key = json.dumps(parameters, sort_keys=True) + data_version
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class TEA_store:
+    """
+    On-disk store of every TEA run, served back instead of recomputing
+    """
+
+    def __init__(self, path=STORE_FILE, precision=None):
+        """
+        Opens (or creates) the SQLite store
+        path: path of the database file, ':memory:' for a temporary store
+        precision: 'float32' or 'float64' to cast the stored float arrays,
+                   None to keep the precision of the results
+        """
+        self.dtype = None if precision is None else np.dtype(precision)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        """
+        Closes the database
+        """
+        self.connection.close()
+
+    def find(self, parameters, data_version):
+        """
+        Returns the run_id of a stored scenario, None if it was never run
+        parameters: dict of the inputs of TEA_engine.compute and 'case_name'
+        data_version: version string of the input data
+        """
+        row = self.connection.execute(
+            'SELECT run_id FROM runs WHERE param_hash = ?',
+            (parameter_hash(parameters, data_version),)).fetchone()
+        return None if row is None else row[0]
+
+    @TEA_profiling.profiled('store save')
+    def save(self, parameters, data_version, results):
+        """
+        Stores a run and returns its run_id
+        parameters: dict of the inputs of TEA_engine.compute and 'case_name'
+        data_version: version string of the input data
+        results: output of TEA_engine.compute
+        """
+        total_cost = results['total_cost_m'].sum(axis=-1, dtype=np.float64)
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (param_hash, data_version, '
+                'created, ' + ', '.join(RUN_PARAMETERS) + ', parameters) '
+                'VALUES (' + ', '.join('?'*(len(RUN_PARAMETERS) + 4)) + ')',
+                [parameter_hash(parameters, data_version), data_version,
+                 time.time()] +
+                [parameters.get(key) for key in RUN_PARAMETERS] +
+                [json.dumps(parameters, sort_keys=True)])
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                'INSERT INTO cases VALUES (' +
+                ', '.join('?'*(len(CASE_PARAMETERS) + 3)) + ')',
+                [[run_id, case] +
+                 [parameters[key][case] for key in CASE_PARAMETERS] +
+                 [total_cost[case]]
+                 for case in range(len(parameters['case_name']))])
+            self.connection.executemany(
+                'INSERT INTO arrays VALUES (?, ?, ?)',
+                [(run_id, name, self.encode(value))
+                 for name, value in results.items()])
+        return run_id
+
+    @TEA_profiling.profiled('store load')
+    def load(self, run_id):
+        """
+        Returns the stored results of a run, as TEA_engine.compute does
+        run_id: id of the run
+        """
+        return {name: self.decode(data) for name, data in
+                self.connection.execute(
+                    'SELECT name, data FROM arrays WHERE run_id = ?',
+                    (run_id,))}
+
+    def compute(self, engine, **parameters):
+        """
+        Serves a scenario from disk, computing and storing it on a miss
+        engine: TEA_engine instance
+        parameters: keyword inputs of engine.compute and 'case_name'
+        Stored runs are served in at most the precision of the engine. A
+        run stored in a lower precision than the engine's (or than the
+        store's, if set) is computed again and replaced.
+        """
+        run_id = self.find(parameters, engine.data_version)
+        if run_id is not None:
+            results = self.load(run_id)
+            precision = engine.dtype if self.dtype is None else \
+                min(engine.dtype, self.dtype, key=lambda dtype: dtype.itemsize)
+            if all(results[name].dtype.itemsize >= precision.itemsize
+                   for name in COMPONENTS):
+                for name in COMPONENTS:
+                    if results[name].dtype.itemsize > engine.dtype.itemsize:
+                        results[name] = results[name].astype(engine.dtype)
+                return results
+            with self.connection:
+                self.connection.execute('DELETE FROM runs WHERE run_id = ?',
+                                        (run_id,))
+
+        inputs = dict(parameters)
+        del inputs['case_name']
+        results = engine.compute(**inputs)
+        self.save(parameters, engine.data_version, results)
+        return results
+
+    def migrate(self, changes):
+        """
+        Follows a reload of the input data: the runs of the changed states
+        are deleted, the others are kept under the new data version
+        Another session on the same file may already have stored a kept run
+        under the new version, its old copy is then dropped.
+        changes: dict returned by TEA_engine.reload
+        Returns the numbers of deleted and kept runs
+        """
+        old_version = changes['old_version']
+        states = changes['states']
+        with self.connection:
+            deleted = self.connection.execute(
+                'DELETE FROM runs WHERE data_version = ? AND state_name IN '
+                '(' + ', '.join('?'*len(states)) + ')',
+                [old_version] + list(states)).rowcount
+            kept = [(parameter_hash(json.loads(parameters),
+                                    changes['data_version']),
+                     changes['data_version'], run_id)
+                    for run_id, parameters in self.connection.execute(
+                        'SELECT run_id, parameters FROM runs '
+                        'WHERE data_version = ?', (old_version,))]
+            self.connection.executemany(
+                'UPDATE OR IGNORE runs SET param_hash = ?, data_version = ? '
+                'WHERE run_id = ?', kept)
+            self.connection.execute(
+                'DELETE FROM runs WHERE data_version = ?', (old_version,))
+        return deleted, len(kept)
+
+    def query(self, where='1', args=(), columns='*'):
+        """
+        Queries past runs without recomputation, one row per (run, case)
+        where: SQL condition on the run_cases view, e.g.
+               "state_name = ? AND PUE < ?"
+        args: values of the ? placeholders, e.g. ('Texas', 1.1)
+        columns: selected columns of the run_cases view
+        Returns a list of dicts
+        """
+        cursor = self.connection.execute(
+            'SELECT ' + columns + ' FROM run_cases WHERE ' + where +
+            ' ORDER BY run_id, case_index', args)
+        names = [description[0] for description in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def encode(self, value):
+        """
+        Serializes a result entry in the .npy format
+        """
+        value = np.asarray(value)
+        if self.dtype is not None and value.dtype.kind == 'f':
+            value = value.astype(self.dtype, copy=False)
+        buffer = io.BytesIO()
+        np.save(buffer, value, allow_pickle=False)
+        return buffer.getvalue()
+
+    def decode(self, data):
+        """
+        Deserializes a result entry stored by encode
+        """
+        value = np.load(io.BytesIO(data), allow_pickle=False)
+        return value[()] if value.ndim == 0 else value
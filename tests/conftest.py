@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The TEA modules sit at the root of the repository, next to the interface
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
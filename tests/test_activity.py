@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+from TEA_data import ActivityModel, days_in_month, month_index
+from TEA_engine import TEA_engine
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+def test_calendar():
+    months = month_index('Jan 2024') + np.arange(12)
+    assert days_in_month(months).sum() == 366
+    assert days_in_month([month_index('Feb 1900'), month_index('Feb 2000'),
+                          month_index('Feb 2023')]).tolist() == [28, 29, 28]
+    assert ActivityModel().hours(months).sum() == 8784
+    assert ActivityModel().daily_hours(months).shape == (366,)
+
+
+def test_planned_outages():
+    months = month_index('Jan 2023') + np.arange(24)
+    spread = ActivityModel(0.99, planned_outage_h=48)
+    assert spread.hours(months[:12]).sum() == pytest.approx(0.99*8760 - 48)
+    assert spread.hours(months[12:]).sum() == pytest.approx(0.99*8784 - 48)
+    august = ActivityModel(planned_outage_h=48, outage_month='Aug')
+    assert (ActivityModel().hours(months) - august.hours(months)).tolist() \
+        == [48 if month % 12 == 7 else 0 for month in months]
+
+
+def test_aligned_with_prices(engine):
+    hours = engine.compute_activity_hours(12)
+    np.testing.assert_array_equal(
+        hours, engine.activity.hours(engine.prices.month_index[-12:]))
+    assert hours is engine.compute_activity_hours(12)
+
+    # Horizons longer than the price data start with its first month
+    n_month = len(engine.treated_months)
+    long = engine.compute_activity_hours(n_month + 100)
+    assert long.size == n_month + 100
+    np.testing.assert_array_equal(
+        long[:n_month], engine.compute_activity_hours(n_month))
+
+
+def test_horizon_beyond_price_data(engine):
+    n_month = len(engine.treated_months)
+    results = engine.compute('Texas', 40, 42, 10, [1.02, 1.2], [11, 15],
+                             [48700, 43200], [28288, 24343], [0.15, 0.19],
+                             0.07, price_type='Present')
+    assert results['total_cost_m'].shape == (2, 480)
+    np.testing.assert_array_equal(results['month_numbers'], np.arange(480))
+    # The whole price history, then its last price held
+    price = engine.compute_electricity_price('Texas', n_month)
+    np.testing.assert_array_equal(results['electricity_price'][:n_month],
+                                  price)
+    assert np.all(results['electricity_price'][n_month:] == price[-1])
+    np.testing.assert_array_equal(
+        results['elec_consumption'][0],
+        1.02*420*engine.compute_activity_hours(480))
+    # Renewals keep following the lifetimes
+    assert np.flatnonzero(results['capital_cost_m'][0]).tolist() == \
+        [0, 132, 264, 396]
+
+    portfolio = engine.compute_portfolio(
+        [{'state': 'Texas', 'n_rack': 42, 'rack_consumption': 10,
+          'case_name': ['A', 'B'], 'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+          'installation_init_cost': [48700, 43200],
+          'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19]}],
+        40, 0.07, price_type='Present')
+    np.testing.assert_array_equal(portfolio['total_cost_m'][0],
+                                  results['total_cost_m'])
+
+    # The legacy profile only covers the activity file
+    profile = TEA_engine(activity='profile')
+    with pytest.raises(ValueError):
+        profile.compute('Texas', 40, 42, 10, [1.2], [15], [43200], [24343],
+                        [0.19], 0.07)
+
+
+def test_activity_model_in_data_version(engine):
+    outages = TEA_engine(activity=ActivityModel(0.95, 100, 'Aug'))
+    assert outages.data_version != engine.data_version
+    results = outages.compute('Texas', 2, 42, 10, [1.2], [15], [43200],
+                              [24343], [0.19], 0.07)
+    months = outages.prices.month_index[-24:]
+    np.testing.assert_allclose(
+        results['elec_consumption'][0],
+        1.2*420*(0.95*24*days_in_month(months) -
+                 100*(months % 12 == 7)))
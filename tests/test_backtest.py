@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine
+
+
+CASES = {'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+         'installation_init_cost': [48700, 43200],
+         'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19]}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+@pytest.mark.parametrize('price_type', ['Future', 'Present'])
+def test_last_window_is_compute(engine, price_type):
+    backtest = engine.backtest('Texas', 5, 42, 10, interest_rate=0.07,
+                               price_type=price_type, arrays=True, **CASES)
+    results = engine.compute('Texas', 5, 42, 10, interest_rate=0.07,
+                             price_type=price_type, **CASES)
+    np.testing.assert_array_equal(backtest['total_cost_m'][-1],
+                                  results['total_cost_m'])
+
+
+def test_windows_slide_over_prices(engine):
+    backtest = engine.backtest('Ohio', 10, 42, 10, interest_rate=0.07,
+                               price_type='Present', arrays=True, **CASES)
+    n_month = len(engine.treated_months)
+    assert len(backtest['start_months']) == n_month - 120 + 1
+    assert backtest['start_months'][0] == engine.treated_months[0]
+    # First month of the window starting at month 5
+    assert backtest['IT_cost_m'][5, 0, 0] == pytest.approx(
+        420*engine.prices.lookup(['Ohio'], ['industrial'])[0, 0, 5] *
+        engine.activity.hours(engine.prices.month_index[5:6])[0])
+    assert backtest['best_share'].sum() == pytest.approx(1)
+
+
+def test_horizon_longer_than_data(engine):
+    with pytest.raises(ValueError):
+        engine.backtest('Ohio', 40, 42, 10, interest_rate=0.07, **CASES)
@@ -0,0 +1,90 @@
+import os
+import shutil
+import subprocess
+import sys
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, PRICE_FILE, ACTIVITY_FILE, DATA_DIR
+
+
+@pytest.fixture
+def files(tmp_path):
+    for path in [PRICE_FILE, ACTIVITY_FILE]:
+        shutil.copy(path, tmp_path)
+    return (str(tmp_path / os.path.basename(PRICE_FILE)),
+            str(tmp_path / os.path.basename(ACTIVITY_FILE)),
+            str(tmp_path / 'cache.npz'))
+
+
+def parsed(engine):
+    return [engine.treated_months, engine.price_columns,
+            engine.retail_prices, engine.activity_hours]
+
+
+def assert_same_data(engine, reference):
+    for value, expected in zip(parsed(engine), parsed(reference)):
+        np.testing.assert_array_equal(value, expected)
+
+
+def test_cache_round_trip(files, monkeypatch):
+    price_file, activity_file, cache_file = files
+    reference = TEA_engine(price_file, activity_file, cache_file=cache_file)
+    assert os.path.exists(cache_file)
+    # No temporary file is left next to the cache
+    assert sorted(os.listdir(os.path.dirname(cache_file))) == sorted(
+        os.path.basename(path) for path in files)
+
+    def no_parsing(*args):
+        raise AssertionError('the cache should be used')
+    monkeypatch.setattr(TEA_engine, 'load_csv', no_parsing)
+    assert_same_data(TEA_engine(price_file, activity_file,
+                                cache_file=cache_file), reference)
+
+
+def test_stale_cache(files):
+    price_file, activity_file, cache_file = files
+    TEA_engine(price_file, activity_file, cache_file=cache_file)
+    with open(activity_file) as file:
+        lines = file.read().splitlines()
+    with open(activity_file, 'w') as file:
+        file.write('\n'.join(lines[:-1]) + '\n')
+
+    engine = TEA_engine(price_file, activity_file, cache_file=cache_file)
+    assert engine.activity_hours.size == len(lines) - 2
+    # The cache follows the new files
+    assert_same_data(TEA_engine(price_file, activity_file,
+                                cache_file=cache_file), engine)
+
+
+@pytest.mark.parametrize('corruption', ['garbage', 'truncated', 'empty'])
+def test_corrupt_cache(files, corruption):
+    price_file, activity_file, cache_file = files
+    reference = TEA_engine(price_file, activity_file, cache_file=cache_file)
+    with open(cache_file, 'rb') as file:
+        content = file.read()
+    content = {'garbage': os.urandom(len(content)),
+               'truncated': content[:len(content)//2],
+               'empty': b''}[corruption]
+    with open(cache_file, 'wb') as file:
+        file.write(content)
+
+    engine = TEA_engine(price_file, activity_file, cache_file=cache_file)
+    assert_same_data(engine, reference)
+    # The cache is rebuilt
+    with np.load(cache_file) as cache:
+        assert str(cache['file_version']) == engine.file_version
+
+
+def test_lazy_imports(files):
+    price_file, activity_file, cache_file = files
+    TEA_engine(price_file, activity_file, cache_file=cache_file)
+    # With a valid cache, neither pandas nor matplotlib is imported
+    code = ('import sys; import TEA_engine, TEA_store, TEA_report; '
+            'TEA_engine.TEA_engine(%r, %r, cache_file=%r); '
+            'print(sorted(module for module in ["pandas", "matplotlib"] '
+            'if module in sys.modules))'
+            % (price_file, activity_file, cache_file))
+    output = subprocess.run([sys.executable, '-c', code], cwd=DATA_DIR,
+                            capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == '[]'
@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, COMPONENTS, cumulative_cost
+
+
+CASES = {'PUE': [1.02, 1.2, 1.5], 'lifetime_y': [11, 15, 2.5],
+         'installation_init_cost': [48700, 43200, 12000],
+         'renewal_cost': [28288, 24343, 9000],
+         'maintenance_rate': [0.15, 0.19, 0.05]}
+
+CASE_KEYS = ['PUE', 'lifetime_y', 'installation_init_cost', 'renewal_cost',
+             'maintenance_rate']
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+@pytest.fixture(scope='module')
+def inputs(engine):
+    return (engine.compute_electricity_price('Texas', 240),
+            engine.compute_activity_hours(240), 420,
+            *[CASES[key] for key in CASE_KEYS], 0.07)
+
+
+def test_cumulative_cost_carries_over_blocks(engine, inputs):
+    reference = cumulative_cost(engine.compute_costs(*inputs)['total_cost_m'])
+    cumulative = np.zeros_like(reference)
+    for cases, months, block in engine.iter_chunks(*inputs, case_chunk=2,
+                                                   month_chunk=50):
+        cumulative[cases, months] = block['cumulative_cost_m']
+    np.testing.assert_allclose(cumulative, reference, rtol=1e-12)
+
+
+def test_spill_files(engine, inputs, tmp_path):
+    reference = engine.compute_costs(*inputs)
+    chunked = engine.compute_chunked(
+        *inputs, case_chunk=2, month_chunk=50, spill=str(tmp_path),
+        spill_components=('total_cost_m', 'IT_cost_m'))
+    for component in ['total_cost_m', 'IT_cost_m']:
+        on_disk = np.load(str(tmp_path / (component + '.npy')))
+        np.testing.assert_allclose(on_disk, reference[component],
+                                   rtol=1e-12)
+        np.testing.assert_array_equal(chunked['spill'][component], on_disk)
+    for component in COMPONENTS:
+        np.testing.assert_allclose(chunked['totals'][component],
+                                   reference[component].sum(axis=-1),
+                                   rtol=1e-12)
+    assert chunked['statistics']['argmin'] == int(np.argmin(
+        reference['total_cost_m'].sum(axis=-1)))
+
+
+def test_daily_steps(engine):
+    # Four years of days at a flat price and load, without interest
+    n_day = 4*365
+    chunked = engine.compute_chunked(
+        np.full(n_day, 0.1), np.full(n_day, 24.), 420,
+        *[CASES[key] for key in CASE_KEYS], 0., month_chunk=100,
+        steps_per_year=365)
+    totals = chunked['totals']
+    np.testing.assert_allclose(totals['IT_cost_m'], 420*0.1*24*n_day)
+    np.testing.assert_allclose(
+        totals['maintenance_cost_year_m'],
+        4*np.multiply(CASES['maintenance_rate'],
+                      CASES['installation_init_cost']))
+    # Only the 2.5 year lifetime renews within four years
+    np.testing.assert_allclose(
+        totals['capital_cost_m'],
+        np.add(CASES['installation_init_cost'], [0, 0, 9000]))
+
+    # Daily compounding of the annual rate
+    daily = engine.compute_costs(np.full(n_day, 0.1), np.full(n_day, 24.),
+                                 420, *[CASES[key] for key in CASE_KEYS],
+                                 0.07, steps_per_year=365)
+    np.testing.assert_allclose(
+        daily['IT_cost_m'][0, 365]/daily['IT_cost_m'][0, 0],
+        (1 + 0.07/365)**-365)
+    assert np.flatnonzero(daily['capital_cost_m'][2]).tolist() == \
+        [0, int(2.5*365)]
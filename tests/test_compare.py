@@ -0,0 +1,47 @@
+import numpy as np
+
+from TEA_compare import compare_cases
+
+
+def make_results(total_cost_m):
+    total_cost_m = np.asarray(total_cost_m, dtype=float)
+    results = {'total_cost_m': total_cost_m,
+               'month_numbers': np.arange(total_cost_m.shape[-1])}
+    for component in ['IT_cost_m', 'cooling_cost_evap_m',
+                      'maintenance_cost_year_m']:
+        results[component] = np.zeros_like(total_cost_m)
+    results['capital_cost_m'] = total_cost_m
+    return results
+
+
+def test_pairwise_deltas_and_ranking():
+    results = make_results([[10, 1, 1, 1], [2, 2, 2, 2], [5, 5, 5, 5]])
+    comparison = compare_cases(results, ['A', 'B', 'C'])
+    cumulative = np.cumsum(results['total_cost_m'], axis=-1)
+    for i in range(3):
+        for j in range(3):
+            np.testing.assert_array_equal(comparison['delta'][i, j],
+                                          cumulative[i] - cumulative[j])
+    assert list(comparison['ranking']) == [1, 0, 2]
+    np.testing.assert_array_equal(comparison['component_delta'][0, 1, -1],
+                                  13 - 8)
+
+
+def test_crossover_months():
+    # Cumulative: A 10 11 12 13 14, B 2 6 10 14 18
+    results = make_results([[10, 1, 1, 1, 1], [2, 4, 4, 4, 4]])
+    comparison = compare_cases(results, ['A', 'B'])
+    assert comparison['crossover'][0, 1] == 3
+    assert comparison['crossover'][1, 0] == -1
+
+    # A tie at the last month is not a crossover
+    results = make_results([[10, 1, 1, 1, 1], [2, 3, 3, 3, 3]])
+    comparison = compare_cases(results, ['A', 'B'])
+    assert comparison['crossover'][0, 1] == -1
+    assert comparison['crossover'][1, 0] == -1
+
+
+def test_single_case():
+    comparison = compare_cases(make_results([[1, 2, 3]]), ['A'])
+    assert comparison['delta'].shape == (1, 1, 3)
+    assert comparison['crossover'][0, 0] == -1
@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine
+
+
+SITES = [
+    {'state': 'Texas', 'region': 'South', 'n_rack': 42,
+     'rack_consumption': 10, 'case_name': ['Evaporative', 'Classic'],
+     'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+     'installation_init_cost': [48700, 43200],
+     'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19]},
+    {'state': 'Ohio', 'region': 'Midwest', 'n_rack': 20,
+     'rack_consumption': 8, 'case_name': ['Evaporative', 'Immersion'],
+     'PUE': [1.05, 1.03], 'lifetime_y': [10, 12],
+     'installation_init_cost': [40000, 60000],
+     'renewal_cost': [25000, 30000], 'maintenance_rate': [0.15, 0.1]},
+    {'state': 'Georgia', 'region': 'South', 'n_rack': 30,
+     'rack_consumption': 12, 'case_name': ['Classic', 'Immersion'],
+     'PUE': [1.3, 1.04], 'lifetime_y': [15, 12],
+     'installation_init_cost': [43200, 61000],
+     'renewal_cost': [24343, 31000], 'maintenance_rate': [0.19, 0.1]}]
+
+
+@pytest.fixture(scope='module')
+def portfolio():
+    engine = TEA_engine()
+    return engine, engine.compute_portfolio(SITES, 10, 0.07,
+                                            price_type='Present')
+
+
+def test_portfolio_matches_single_sites(portfolio):
+    engine, results = portfolio
+    for index, site in enumerate(SITES):
+        single = engine.compute(
+            site['state'], 10, site['n_rack'], site['rack_consumption'],
+            site['PUE'], site['lifetime_y'], site['installation_init_cost'],
+            site['renewal_cost'], site['maintenance_rate'], 0.07,
+            price_type='Present')
+        np.testing.assert_allclose(results['total_cost_m'][index],
+                                   single['total_cost_m'], rtol=1e-12)
+
+
+def test_group_by_region(portfolio):
+    engine, results = portfolio
+    groups = engine.aggregate_portfolio(results, 'region')
+    assert list(groups) == ['South', 'Midwest']
+    np.testing.assert_allclose(
+        groups['South'],
+        results['total_cost_m'][0] + results['total_cost_m'][2])
+    np.testing.assert_allclose(groups['Midwest'],
+                               results['total_cost_m'][1])
+    np.testing.assert_allclose(sum(groups.values()),
+                               results['total_cost_m'].sum(axis=0))
+
+
+def test_group_by_case(portfolio):
+    engine, results = portfolio
+    groups = engine.aggregate_portfolio(results, 'case')
+    assert sorted(groups) == ['Classic', 'Evaporative', 'Immersion']
+    cost = results['total_cost_m']
+    np.testing.assert_allclose(groups['Evaporative'], cost[0, 0] + cost[1, 0])
+    np.testing.assert_allclose(groups['Classic'], cost[0, 1] + cost[2, 0])
+    np.testing.assert_allclose(groups['Immersion'], cost[1, 1] + cost[2, 1])
+    # Every (site, case) cell falls in one group
+    np.testing.assert_allclose(sum(groups.values()),
+                               cost.sum(axis=(0, 1)))
+    # The sites name their cases differently, no fleet total per position
+    assert 'fleet_cost_m' not in results
+
+
+def test_fleet_cost_of_same_cases(portfolio):
+    engine, results = portfolio
+    sites = [dict(site, case_name=['A', 'B']) for site in SITES]
+    same = engine.compute_portfolio(sites, 10, 0.07, price_type='Present')
+    groups = engine.aggregate_portfolio(same, 'case')
+    np.testing.assert_allclose(same['fleet_cost_m'],
+                               [groups['A'], groups['B']])
+
+
+def test_float64_accumulation():
+    engine = TEA_engine(precision='float32')
+    results = engine.compute_portfolio(SITES, 10, 0.07)
+    assert results['total_cost_m'].dtype == np.float32
+    for by in ['case', 'region']:
+        for group in engine.aggregate_portfolio(results, by).values():
+            assert group.dtype == np.float64
+
+
+def test_lifetime_shorter_than_a_step(portfolio):
+    engine, results = portfolio
+    with pytest.raises(ValueError):
+        engine.compute_costs(np.full(12, 0.1), np.full(12, 720.), 420,
+                             [1.2], [0.05], [43200], [24343], [0.19], 0.07)
+    with pytest.raises(ValueError):
+        engine.compute('Texas', 5, 42, 10, [1.2], [0], [43200], [24343],
+                       [0.19], 0.07)
+
+
+def test_sites_must_share_case_count(portfolio):
+    engine, results = portfolio
+    sites = [SITES[0], dict(SITES[1], case_name=['Evaporative'])]
+    with pytest.raises(ValueError):
+        engine.compute_portfolio(sites, 10, 0.07)
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine
+from TEA_finance import cash_flows, internal_rate_of_return, \
+    net_present_value, payback_month
+
+
+CASES = {'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+         'installation_init_cost': [48700, 43200],
+         'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19]}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+def test_without_financing_is_engine_present_cost(engine):
+    future = engine.compute('Texas', 20, 42, 10, interest_rate=0.07,
+                            price_type='Future', **CASES)
+    present = engine.compute('Texas', 20, 42, 10, interest_rate=0.07,
+                             price_type='Present', **CASES)
+    finance = cash_flows(future, CASES['installation_init_cost'], 0.07)
+    np.testing.assert_allclose(-finance['npv'],
+                               present['total_cost_m'].sum(axis=-1))
+
+    # A loan at the discount rate does not change the present cost
+    loan = cash_flows(future, CASES['installation_init_cost'], 0.07,
+                      loan_share=1, loan_rate=0.07, loan_term_y=10)
+    np.testing.assert_allclose(loan['npv'], finance['npv'])
+    np.testing.assert_allclose(
+        loan['loan_payment_m'].sum(axis=-1) -
+        loan['loan_interest_m'].sum(axis=-1), CASES['installation_init_cost'])
+
+
+def test_depreciation_and_taxes(engine):
+    future = engine.compute('Ohio', 20, 42, 10, interest_rate=0.07,
+                            price_type='Future', **CASES)
+    finance = cash_flows(future, CASES['installation_init_cost'], 0.07,
+                         inflation_rate=0.02, tax_rate=0.25,
+                         depreciation_y=5, revenue_m=40000)
+    # Every investment is fully depreciated within the horizon
+    np.testing.assert_allclose(finance['depreciation_m'].sum(axis=-1),
+                               finance['capex_m'].sum(axis=-1))
+    assert finance['capex_m'][0, 132] > CASES['renewal_cost'][0]
+    assert np.all(finance['payback_month'] >= 0)
+
+
+def test_irr_and_payback():
+    cash_flow_m = np.array([[-100.] + [10]*12, [-100.] + [-1]*12])
+    irr = internal_rate_of_return(cash_flow_m)
+    monthly = (1 + irr[0])**(1/12) - 1
+    assert net_present_value(cash_flow_m[0], 12*monthly) == \
+        pytest.approx(0, abs=1e-9)
+    assert np.isnan(irr[1])
+    assert list(payback_month(cash_flow_m)) == [10, -1]
+
+
+def test_refuses_discounted_costs(engine):
+    present = engine.compute('Texas', 5, 42, 10, interest_rate=0.07,
+                             price_type='Present', **CASES)
+    with pytest.raises(ValueError):
+        cash_flows(present, CASES['installation_init_cost'], 0.07)
+
+
+def test_refuses_discounted_backtest(engine):
+    present = engine.backtest('Texas', 5, 42, 10, interest_rate=0.07,
+                              price_type='Present', arrays=True, **CASES)
+    with pytest.raises(ValueError):
+        cash_flows(present, CASES['installation_init_cost'], 0.07)
+    future = engine.backtest('Texas', 5, 42, 10, interest_rate=0.07,
+                             price_type='Future', arrays=True, **CASES)
+    finance = cash_flows(future, CASES['installation_init_cost'], 0.07)
+    assert finance['npv'].shape == present['net_present_cost'].shape
+    np.testing.assert_allclose(-finance['npv'], present['net_present_cost'])
+
+    # Results of unknown discounting are refused
+    with pytest.raises(ValueError):
+        cash_flows({key: value for key, value in future.items()
+                    if key != 'interest_rate'},
+                   CASES['installation_init_cost'], 0.07)
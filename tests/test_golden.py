@@ -0,0 +1,226 @@
+"""
+Golden outputs of the cost model
+
+The golden file holds the monthly components of the original month by month
+loop for a matrix of states, sectors, horizons and interest modes. Every
+engine path is checked against it. After a deliberate change of the model
+or of the input data, regenerate it with
+
+    python -m tests.test_golden
+"""
+import os
+import hashlib
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, COMPONENTS, PRICE_FILE, ACTIVITY_FILE
+from TEA_service import check_scenario, evaluate_batch
+
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           'golden', 'cost_model.npz')
+
+STATES = ['California', 'Texas', 'Hawaii', 'Ohio']
+SECTORS = ['industrial', 'commercial', 'residential']
+HORIZONS_Y = [1, 7.5, 21]
+PRICE_TYPES = ['Future', 'Present']
+
+IT_LOAD = 42*10
+INTEREST_RATE = 0.07
+# The fractional lifetime renews on non-integer years
+CASES = {'PUE': [1.02, 1.2, 1.5], 'lifetime_y': [11, 15, 2.5],
+         'installation_init_cost': [48700, 43200, 12000],
+         'renewal_cost': [28288, 24343, 9000],
+         'maintenance_rate': [0.15, 0.19, 0.05]}
+
+# The engine follows the loop operation by operation, float32 rounds
+TOLERANCES = {'float64': 1e-12, 'float32': 1e-6}
+
+
+def scenarios():
+    """
+    Yields the (state, sector, sim_time_y, price_type) matrix
+    """
+    for state in STATES:
+        for sector in SECTORS:
+            for sim_time_y in HORIZONS_Y:
+                for price_type in PRICE_TYPES:
+                    yield state, sector, sim_time_y, price_type
+
+
+def golden_key(state, sector, sim_time_y, price_type, component):
+    return '|'.join([state, sector, str(sim_time_y), price_type, component])
+
+
+def data_version():
+    digest = hashlib.sha1()
+    for path in [PRICE_FILE, ACTIVITY_FILE]:
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def reference_costs(state, sector, sim_time_y, price_type):
+    """
+    Month by month loop of the original interface, on the raw CSV files
+    """
+    import pandas as pd
+    retail_price_data = pd.read_csv(PRICE_FILE, skiprows=4)
+    activity_hours_data = pd.read_csv(ACTIVITY_FILE)
+    interest_rate = 0 if price_type == 'Future' else INTEREST_RATE
+    PUE, lifetime_y, installation_init_cost, renewal_cost, \
+        maintenance_rate = [CASES[key] for key in
+                            ['PUE', 'lifetime_y', 'installation_init_cost',
+                             'renewal_cost', 'maintenance_rate']]
+
+    sim_time_m = int(round(12*sim_time_y))
+    retail_price_daily = []
+    treated_months = []
+    for month in retail_price_data['Month']:
+        if month not in treated_months:
+            retail_price_daily += [list(retail_price_data[
+                state + ' ' + sector + ' cents per kilowatthour'][
+                retail_price_data['Month'] == month])[0]]
+            treated_months.append(month)
+    electricity_price = np.flip(retail_price_daily)[-sim_time_m:]/100
+    activity_hours = list(activity_hours_data['hours'][-sim_time_m:])
+    month_numbers = np.array([k for k in range(
+        len(treated_months))])[:sim_time_m]
+
+    n_case = len(PUE)
+    results = {component: np.zeros((n_case, month_numbers.size))
+               for component in COMPONENTS}
+    for case in range(n_case):
+        lifetime_m = int(lifetime_y[case]*12)
+        results['capital_cost_m'][case][0] = installation_init_cost[case]
+        for i in month_numbers:
+            if i % lifetime_m == 0 and i != 0:
+                results['capital_cost_m'][case][i] += renewal_cost[case] *\
+                    (1 + interest_rate/12)**(-i)
+            results['IT_cost_m'][case][i] = IT_LOAD * \
+                electricity_price[i] * activity_hours[i] * \
+                (1 + interest_rate/12)**(-i)
+            results['cooling_cost_evap_m'][case][i] = (PUE[case]-1) * \
+                IT_LOAD * electricity_price[i] * activity_hours[i] * \
+                (1 + interest_rate/12)**(-i)
+            results['elec_consumption'][case][i] = PUE[case] * \
+                IT_LOAD * activity_hours[i]
+            results['maintenance_cost_year_m'][case][i] = (
+                maintenance_rate[case] * installation_init_cost[case]) \
+                / 12 * (1 + interest_rate/12)**(-i)
+            results['op_cost_m'][case][i] = results['IT_cost_m'][case][i] + \
+                results['cooling_cost_evap_m'][case][i] + \
+                results['maintenance_cost_year_m'][case][i]
+        results['total_cost_m'][case] = results['capital_cost_m'][case] + \
+            results['op_cost_m'][case]
+    return results
+
+
+def regenerate():
+    """
+    Writes the golden file from the reference loop
+    """
+    golden = {'data_version': np.array(data_version())}
+    for scenario in scenarios():
+        results = reference_costs(*scenario)
+        for component in COMPONENTS:
+            golden[golden_key(*scenario, component)] = results[component]
+    os.makedirs(os.path.dirname(GOLDEN_FILE), exist_ok=True)
+    np.savez_compressed(GOLDEN_FILE, **golden)
+
+
+@pytest.fixture(scope='module')
+def golden():
+    with np.load(GOLDEN_FILE) as file:
+        golden = dict(file)
+    if str(golden['data_version']) != data_version():
+        pytest.fail('The input data changed since the golden outputs were '
+                    'written, check the change and run '
+                    'python -m tests.test_golden')
+    return golden
+
+
+# The original loop takes the activity hours from the tail of the csv file
+@pytest.fixture(scope='module', params=['float64', 'float32'])
+def engine(request):
+    return TEA_engine(precision=request.param, activity='profile')
+
+
+def assert_golden(golden, scenario, results, precision):
+    for component in COMPONENTS:
+        np.testing.assert_allclose(
+            results[component], golden[golden_key(*scenario, component)],
+            rtol=TOLERANCES[precision], atol=1e-9,
+            err_msg=golden_key(*scenario, component))
+
+
+@pytest.mark.parametrize('scenario', list(scenarios()),
+                         ids=lambda scenario: '-'.join(map(str, scenario)))
+def test_compute(golden, engine, scenario):
+    state, sector, sim_time_y, price_type = scenario
+    results = engine.compute(state, sim_time_y, 42, 10, sector=sector,
+                             interest_rate=INTEREST_RATE,
+                             price_type=price_type, **CASES)
+    assert_golden(golden, scenario, results, engine.dtype.name)
+
+
+@pytest.mark.parametrize('price_type', PRICE_TYPES)
+def test_portfolio(golden, engine, price_type):
+    sites = [dict(CASES, state=state, n_rack=42, rack_consumption=10,
+                  case_name=['A', 'B', 'C']) for state in STATES]
+    results = engine.compute_portfolio(sites, 7.5, INTEREST_RATE,
+                                       price_type=price_type,
+                                       sector='commercial')
+    for site, state in enumerate(STATES):
+        assert_golden(golden, (state, 'commercial', 7.5, price_type),
+                      {component: results[component][site]
+                       for component in COMPONENTS}, engine.dtype.name)
+
+
+@pytest.mark.parametrize('price_type', PRICE_TYPES)
+def test_chunked(golden, engine, price_type):
+    scenario = ('Hawaii', 'industrial', 21, price_type)
+    sim_time_m = 252
+    chunked = engine.compute_chunked(
+        engine.compute_electricity_price('Hawaii', sim_time_m),
+        engine.compute_activity_hours(sim_time_m), IT_LOAD,
+        *[CASES[key] for key in ['PUE', 'lifetime_y',
+                                 'installation_init_cost', 'renewal_cost',
+                                 'maintenance_rate']],
+        0 if price_type == 'Future' else INTEREST_RATE,
+        case_chunk=2, month_chunk=50)
+    for component in COMPONENTS:
+        np.testing.assert_allclose(
+            chunked['totals'][component],
+            golden[golden_key(*scenario, component)].sum(axis=-1),
+            rtol=TOLERANCES[engine.dtype.name])
+
+
+@pytest.mark.parametrize('price_type', PRICE_TYPES)
+def test_backtest_last_window(golden, engine, price_type):
+    backtest = engine.backtest('Texas', 7.5, 42, 10, sector='residential',
+                               interest_rate=INTEREST_RATE,
+                               price_type=price_type, arrays=True, **CASES)
+    assert_golden(golden, ('Texas', 'residential', 7.5, price_type),
+                  {component: backtest[component][-1]
+                   for component in COMPONENTS}, engine.dtype.name)
+
+
+def test_service_batch(golden, engine):
+    batch = [check_scenario(dict(CASES, state_name=state, sim_time_y=21,
+                                 n_rack=42, rack_consumption=10,
+                                 interest_rate=INTEREST_RATE,
+                                 price_type=price_type, sector=sector))
+             for state, sector, price_type in
+             [('California', 'industrial', 'Present'),
+              ('Ohio', 'industrial', 'Future'),
+              ('Hawaii', 'commercial', 'Present')]]
+    for scenario, response in zip(batch, evaluate_batch(engine, batch)):
+        assert_golden(golden, (scenario['state_name'], scenario['sector'],
+                               21, scenario['price_type']),
+                      {component: np.array(response[component])
+                       for component in COMPONENTS}, engine.dtype.name)
+
+
+if __name__ == '__main__':
+    regenerate()
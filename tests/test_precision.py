@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, COMPONENTS, cumulative_cost, \
+    net_present_cost
+from TEA_store import TEA_store
+
+
+SCENARIO = {'state_name': 'California', 'sim_time_y': 20, 'n_rack': 42,
+            'rack_consumption': 10, 'PUE': [1.02, 1.2],
+            'lifetime_y': [11, 15], 'installation_init_cost': [48700, 43200],
+            'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19],
+            'interest_rate': 0.07, 'price_type': 'Present'}
+
+
+@pytest.fixture(scope='module')
+def engines():
+    return TEA_engine(), TEA_engine(precision='float32')
+
+
+def test_float32_storage(engines):
+    double, single = engines
+    results = single.compute(**SCENARIO)
+    for name in COMPONENTS:
+        assert results[name].dtype == np.float32
+    assert cumulative_cost(results['total_cost_m']).dtype == np.float64
+
+
+@pytest.mark.parametrize('price_type', ['Future', 'Present'])
+@pytest.mark.parametrize('state_name', ['California', 'Texas', 'Hawaii'])
+def test_float32_npv_accuracy(engines, state_name, price_type):
+    double, single = engines
+    scenario = dict(SCENARIO, state_name=state_name, price_type=price_type)
+    reference = net_present_cost(double.compute(**scenario))
+    compact = net_present_cost(single.compute(**scenario))
+    # float32 rounding (~6e-8 relative) per month, accumulated in float64
+    np.testing.assert_allclose(compact, reference, rtol=1e-6)
+
+
+def test_float32_cumulative_accuracy(engines):
+    double, single = engines
+    reference = cumulative_cost(double.compute(**SCENARIO)['total_cost_m'])
+    compact = cumulative_cost(single.compute(**SCENARIO)['total_cost_m'])
+    np.testing.assert_allclose(compact, reference, rtol=1e-6)
+
+
+def test_float32_chunked_totals(engines):
+    double, single = engines
+    rng = np.random.default_rng(0)
+    n_case = 500
+    parameters = [rng.uniform(1.01, 1.5, n_case), rng.uniform(5, 15, n_case),
+                  rng.uniform(3e4, 6e4, n_case), rng.uniform(1e4, 3e4, n_case),
+                  rng.uniform(0.1, 0.2, n_case)]
+    price = double.compute_electricity_price('Texas', 240)
+    hours = double.compute_activity_hours(240)
+    reference = double.compute_chunked(price, hours, 420, *parameters, 0.07,
+                                       case_chunk=128, month_chunk=50)
+    compact = single.compute_chunked(price, hours, 420, *parameters, 0.07,
+                                     case_chunk=128, month_chunk=50)
+    np.testing.assert_allclose(compact['totals']['total_cost_m'],
+                               reference['totals']['total_cost_m'],
+                               rtol=1e-6)
+
+
+def test_float32_store(engines):
+    double, single = engines
+    store = TEA_store(':memory:', precision='float32')
+    parameters = dict(SCENARIO, case_name=['Evaporative', 'Classic'])
+    computed = store.compute(double, **parameters)
+    loaded = store.compute(double, **parameters)
+    assert loaded['total_cost_m'].dtype == np.float32
+    np.testing.assert_allclose(net_present_cost(loaded),
+                               net_present_cost(computed), rtol=1e-6)
+    store.close()
+
+
+def test_shared_store_keeps_precision(engines):
+    double, single = engines
+    store = TEA_store(':memory:')
+    parameters = dict(SCENARIO, case_name=['Evaporative', 'Classic'])
+    store.compute(single, **parameters)
+    # A float32 run is not served to a float64 engine, it is replaced
+    upgraded = store.compute(double, **parameters)
+    assert upgraded['total_cost_m'].dtype == np.float64
+    assert len(store.query()) == 2
+    np.testing.assert_array_equal(
+        store.compute(double, **parameters)['total_cost_m'],
+        upgraded['total_cost_m'])
+    # The float64 run is cast for a float32 engine
+    downcast = store.compute(single, **parameters)
+    assert downcast['total_cost_m'].dtype == np.float32
+    np.testing.assert_array_equal(
+        downcast['total_cost_m'],
+        upgraded['total_cost_m'].astype(np.float32))
+    store.close()
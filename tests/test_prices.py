@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from TEA_data import PriceCube
+from TEA_engine import TEA_engine
+
+
+MONTHS = ['Jan 2020', 'Feb 2020', 'Mar 2020', 'Apr 2020', 'May 2020',
+          'Jun 2020']
+
+COLUMNS = ['Texas industrial cents per kilowatthour',
+           'Texas transportation cents per kilowatthour',
+           'Ohio industrial cents per kilowatthour',
+           'Ohio transportation cents per kilowatthour']
+
+nan = np.nan
+# Chronological (month x column) prices (cents/kWh)
+PRICES = np.array([[nan, 9., 6., 0.],
+                   [5., 9., 8., 0.],
+                   [6., 0., nan, 0.],
+                   [nan, 11., nan, 12.],
+                   [8., 11., 14., 0.],
+                   [9., nan, 16., 0.]])
+
+
+@pytest.fixture
+def cube():
+    return PriceCube(MONTHS, COLUMNS, PRICES)
+
+
+def test_gap_filling(cube):
+    # Interior gaps are interpolated, edge gaps take the nearest value
+    np.testing.assert_allclose(
+        cube.lookup(['Texas'], ['industrial'])[0, 0],
+        [0.05, 0.05, 0.06, 0.07, 0.08, 0.09])
+    np.testing.assert_allclose(
+        cube.lookup(['Ohio'], ['industrial'])[0, 0],
+        [0.06, 0.08, 0.10, 0.12, 0.14, 0.16])
+
+
+def test_zero_prices_are_missing(cube):
+    np.testing.assert_allclose(
+        cube.lookup(['Texas'], ['transportation'])[0, 0],
+        [0.09, 0.09, 0.10, 0.11, 0.11, 0.11])
+    # Five months without sales out of six
+    with pytest.raises(ValueError, match='Ohio transportation'):
+        cube.lookup(['Ohio'], ['transportation'])
+
+
+def test_lookup(cube):
+    prices = cube.lookup(['Ohio', 'Texas'], ['industrial'], 2)
+    assert prices.shape == (2, 1, 2)
+    np.testing.assert_allclose(prices[:, 0], [[0.14, 0.16], [0.08, 0.09]])
+    with pytest.raises(KeyError, match='Unknown state: Atlantis'):
+        cube.lookup(['Atlantis'], ['industrial'])
+    with pytest.raises(KeyError, match='Unknown sector: rail'):
+        cube.lookup(['Texas'], ['rail'])
+    # The sector exists but no state reports it
+    with pytest.raises(ValueError):
+        cube.lookup(['Texas'], ['residential'])
+
+
+def test_report(cube):
+    report = cube.report()
+    assert report['filled'] == {('Texas', 'industrial'): 2,
+                                ('Texas', 'transportation'): 2,
+                                ('Ohio', 'industrial'): 2}
+    assert ('Ohio', 'transportation') in report['refused']
+    assert ('Texas', 'transportation') not in report['refused']
+
+
+def test_invalid_data():
+    with pytest.raises(ValueError, match='consecutive'):
+        PriceCube(MONTHS[:2] + MONTHS[3:], COLUMNS, PRICES[1:])
+    with pytest.raises(ValueError, match='negative'):
+        PriceCube(MONTHS, COLUMNS, -PRICES)
+    with pytest.raises(ValueError, match='Unexpected'):
+        PriceCube(MONTHS, COLUMNS[:3] + ['Ohio trains'], PRICES)
+
+
+def test_no_zero_prices_in_the_data():
+    prices = TEA_engine().prices
+    assert not np.any(prices.cube[prices.valid] == 0)
+    assert ('Alaska', 'transportation') in prices.report()['refused']
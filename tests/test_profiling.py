@@ -0,0 +1,130 @@
+import json
+import os
+import threading
+import time
+import pytest
+
+import TEA_profiling
+
+
+@pytest.fixture
+def profiling():
+    was_enabled = TEA_profiling.enabled
+    TEA_profiling.disable()
+    TEA_profiling.reset()
+    yield TEA_profiling
+    TEA_profiling.disable()
+    TEA_profiling.reset()
+    if was_enabled:
+        TEA_profiling.enable()
+
+
+@TEA_profiling.profiled('square')
+def square(value):
+    return value*value
+
+
+def test_enable_disable_reset(profiling):
+    assert profiling.stage('off') is profiling.no_stage
+    assert square(3) == 9
+    assert profiling.events == []
+
+    profiling.enable()
+    square(3)
+    with profiling.stage('on', size=2):
+        pass
+    assert [event['name'] for event in profiling.events] == ['square', 'on']
+    assert profiling.events[1]['args'] == {'size': 2}
+
+    # Disabling keeps the recorded stages, reset forgets them
+    profiling.disable()
+    square(3)
+    assert len(profiling.events) == 2
+    profiling.reset()
+    assert profiling.events == [] and profiling.summary() == {}
+
+
+def test_profiled_returns_the_result(profiling):
+    assert square.__name__ == 'square'
+    assert square(4) == 16
+    profiling.enable()
+    assert square(5) == 25
+
+
+def test_summary_of_nested_stages(profiling):
+    profiling.enable()
+    for k in range(3):
+        with profiling.stage('outer'):
+            time.sleep(0.01)
+            with profiling.stage('inner'):
+                time.sleep(0.02)
+    summary = profiling.summary()
+    assert summary['outer']['calls'] == summary['inner']['calls'] == 3
+    # The outer stage includes the inner one
+    assert summary['inner']['total_s'] >= 0.06
+    assert summary['outer']['total_s'] >= summary['inner']['total_s'] + 0.03
+    assert summary['outer']['mean_s'] == pytest.approx(
+        summary['outer']['total_s']/3)
+    assert summary['outer']['max_s'] >= summary['outer']['mean_s']
+    assert 'peak_bytes' not in summary['outer']
+
+
+def test_allocations(profiling):
+    profiling.enable(allocations=True)
+    with profiling.stage('outer'):
+        with profiling.stage('temporary'):
+            buffer = bytearray(4*10**6)
+            del buffer
+        kept = bytearray(10**6)
+    del kept
+    summary = profiling.summary()
+    assert summary['temporary']['peak_bytes'] >= 4*10**6
+    assert abs(summary['temporary']['allocated_bytes']) < 10**5
+    assert summary['outer']['allocated_bytes'] >= 10**6
+    # The peak of the inner stage counts in the outer one
+    assert summary['outer']['peak_bytes'] >= 4*10**6
+
+
+def test_threads_nest_their_own_stages(profiling):
+    profiling.enable(allocations=True)
+    inside = threading.Event()
+    leave = threading.Event()
+
+    def loader():
+        with profiling.stage('csv loading'):
+            inside.set()
+            leave.wait(5)
+
+    thread = threading.Thread(target=loader)
+    with profiling.stage('main'):
+        kept = bytearray(2*10**6)
+        thread.start()
+        inside.wait(5)
+    # The main stage closes while the loader stage is open, each thread
+    # closes its own stage
+    leave.set()
+    thread.join()
+    del kept
+    events = {event['name']: event for event in profiling.events}
+    assert events['main']['tid'] != events['csv loading']['tid']
+    assert events['main']['args']['allocated_bytes'] >= 2*10**6
+    assert abs(events['csv loading']['args']['allocated_bytes']) < 10**5
+
+
+def test_chrome_trace(profiling, tmp_path):
+    profiling.enable()
+    start = time.perf_counter_ns()/1e3
+    with profiling.stage('stage', case=1):
+        time.sleep(0.01)
+    path = str(tmp_path / 'trace.json')
+    profiling.export_chrome_trace(path)
+    with open(path) as file:
+        trace = json.load(file)
+    event, = trace['traceEvents']
+    assert event['name'] == 'stage' and event['ph'] == 'X'
+    # Timestamps and durations in microseconds
+    assert event['ts'] == pytest.approx(start, abs=5e3)
+    assert 1e4 <= event['dur'] < 1e6
+    assert event['pid'] == os.getpid()
+    assert event['tid'] == threading.get_ident()
+    assert event['args'] == {'case': 1}
@@ -0,0 +1,177 @@
+import os
+import json
+import shutil
+import asyncio
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, PRICE_FILE, ACTIVITY_FILE
+from TEA_service import TEA_service, DEFAULT_SCENARIO, request
+from TEA_store import TEA_store
+
+
+SCENARIO = {'sim_time_y': 5, 'n_rack': 42, 'rack_consumption': 10,
+            'case_name': ['Evaporative', 'Classic'], 'PUE': [1.02, 1.2],
+            'lifetime_y': [11, 15], 'installation_init_cost': [48700, 43200],
+            'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19],
+            'interest_rate': 0.07, 'price_type': 'Present'}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    for path in [PRICE_FILE, ACTIVITY_FILE]:
+        shutil.copy(path, tmp_path)
+    return TEA_engine(
+        str(tmp_path / os.path.basename(PRICE_FILE)),
+        str(tmp_path / os.path.basename(ACTIVITY_FILE)),
+        cache_file=str(tmp_path / 'cache.npz'))
+
+
+def edit(path, old, new):
+    with open(path) as file:
+        content = file.read()
+    assert old in content
+    with open(path, 'w') as file:
+        file.write(content.replace(old, new, 1))
+    # Coarse file systems may keep the same modification time
+    status = os.stat(path)
+    os.utime(path, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+
+
+def test_unchanged_files(engine):
+    assert engine.reload() is None
+    os.utime(engine.price_file)
+    assert engine.reload() is None
+
+
+def test_price_change_affects_one_state(engine, tmp_path):
+    store = TEA_store(':memory:')
+    for state in ['Texas', 'Ohio']:
+        store.compute(engine, state_name=state, **SCENARIO)
+    texas = engine.compute_electricity_price('Texas', 60)
+    ohio = engine.compute_electricity_price('Ohio', 60)
+
+    # Latest industrial price of Texas, first column of the Texas block
+    column = list(engine.price_columns).index(
+        'Texas industrial cents per kilowatthour')
+    with open(engine.price_file) as file:
+        lines = file.read().splitlines()
+    row = lines[5].split(',')
+    row[1 + column] = str(float(row[1 + column]) + 1)
+    edit(engine.price_file, lines[5], ','.join(row))
+
+    old_version = engine.data_version
+    changes = engine.reload()
+    assert changes['states'] == ['Texas']
+    assert changes['old_version'] == old_version != engine.data_version
+    np.testing.assert_allclose(
+        engine.compute_electricity_price('Texas', 60)[-1], texas[-1] + 0.01)
+    np.testing.assert_array_equal(
+        engine.compute_electricity_price('Ohio', 60), ohio)
+
+    # Ohio is still served from the store, Texas is recomputed
+    assert store.migrate(changes) == (1, 1)
+    assert store.find(dict(SCENARIO, state_name='Ohio'),
+                      engine.data_version) is not None
+    assert store.find(dict(SCENARIO, state_name='Texas'),
+                      engine.data_version) is None
+
+    # The binary cache follows the new data
+    cached = TEA_engine(engine.price_file, engine.activity_file,
+                        cache_file=str(tmp_path / 'cache.npz'))
+    np.testing.assert_array_equal(cached.retail_prices,
+                                  engine.retail_prices)
+
+
+def test_activity_change_affects_every_state(engine):
+    hours = engine.activity_hours[-1]
+    with open(engine.activity_file) as file:
+        last = file.read().splitlines()[-1]
+    edit(engine.activity_file, last,
+         last.rsplit(',', 1)[0] + ',' + str(float(hours) + 1))
+    changes = engine.reload()
+    assert changes['files'] == [engine.activity_file]
+    assert changes['states'] == sorted(engine.prices.states)
+    assert engine.activity_hours[-1] == hours + 1
+
+
+def test_failed_reload_leaves_engine_unchanged(engine):
+    def run():
+        inputs = {key: value for key, value in SCENARIO.items()
+                  if key != 'case_name'}
+        return engine.compute(state_name='Texas', **inputs)['total_cost_m']
+
+    old_version = engine.data_version
+    expected = run()
+
+    # A month missing in the middle of the price data
+    with open(engine.price_file) as file:
+        content = file.read()
+    rows = [line for line in content.splitlines(keepends=True)
+            if line.startswith('Jun 2022,')]
+    edit(engine.price_file, ''.join(rows), '')
+    for attempt in range(2):
+        with pytest.raises(ValueError):
+            engine.reload()
+        assert engine.data_version == old_version
+        assert len(engine.treated_months) == engine.prices.cube.shape[-1]
+        np.testing.assert_array_equal(run(), expected)
+
+    # Once the file is fixed, it has the loaded content again
+    with open(engine.price_file, 'w') as file:
+        file.write(content)
+    assert engine.reload() is None
+    assert engine.data_version == old_version
+
+
+def test_migrate_shared_store(engine, tmp_path):
+    # Two sessions on one store file, the second already ran Ohio on the
+    # new data
+    path = str(tmp_path / 'runs.sqlite')
+    first, second = TEA_store(path), TEA_store(path)
+    scenario = dict(SCENARIO, state_name='Ohio')
+    first.compute(engine, **scenario)
+    changes = {'files': [engine.price_file], 'states': ['Texas'],
+               'old_version': engine.data_version, 'data_version': 'new'}
+    inputs = dict(scenario)
+    del inputs['case_name']
+    second.save(scenario, 'new', engine.compute(**inputs))
+
+    assert first.migrate(changes) == (0, 1)
+    assert first.find(scenario, 'new') is not None
+    assert first.find(scenario, engine.data_version) is None
+    assert len(first.query()) == len(SCENARIO['case_name'])
+
+
+def test_service_keeps_serving_invalid_data(engine, capsys):
+    expected = engine.compute(state_name='California', **{
+        key: value for key, value in DEFAULT_SCENARIO.items()
+        if key not in ['case_name', 'state_name']})['total_cost_m']
+    old_version = engine.data_version
+    with open(engine.activity_file, 'a') as file:
+        file.write('0,-5\n')
+
+    async def health(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /health HTTP/1.1\r\nConnection: close\r\n\r\n')
+        response = await reader.read()
+        writer.close()
+        return json.loads(response.split(b'\r\n\r\n', 1)[1])
+
+    async def main():
+        service = TEA_service(engine, n_workers=0, reload_interval=0)
+        port = await service.start(port=0)
+        try:
+            return (await request('127.0.0.1', port, DEFAULT_SCENARIO),
+                    await health(port),
+                    await request('127.0.0.1', port, DEFAULT_SCENARIO))
+        finally:
+            await service.stop()
+
+    first, status, second = asyncio.run(asyncio.wait_for(main(), 30))
+    for response in [first, second]:
+        np.testing.assert_array_equal(response['total_cost_m'], expected)
+    assert status['data_version'] == old_version == engine.data_version
+    assert 'activity' in status['reload_error']
+    # Logged once while the file stays invalid
+    assert capsys.readouterr().err.count('Input data not reloaded') == 1
@@ -0,0 +1,74 @@
+import multiprocessing
+import numpy as np
+import pytest
+
+import TEA_report
+from TEA_engine import TEA_engine
+from TEA_service import DEFAULT_SCENARIO
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+def test_png_pages(engine, tmp_path):
+    scenarios = [dict(DEFAULT_SCENARIO, state_name=state)
+                 for state in ['Texas', 'New York']]
+    files = TEA_report.render_report(
+        scenarios, str(tmp_path), ['None', 'Stackplot'], dpi=50,
+        n_workers=0, engine=engine)
+    assert [path.split('/')[-1] for path in files] == [
+        '000_tea_for_Texas.png', '000_tea_for_Texas_Stackplot.png',
+        '001_tea_for_New_York.png', '001_tea_for_New_York_Stackplot.png']
+
+
+def test_pdf_report(engine, tmp_path):
+    output = str(tmp_path / 'report.pdf')
+    TEA_report.render_report([DEFAULT_SCENARIO]*3, output, dpi=50,
+                             n_workers=0, engine=engine)
+    with open(output, 'rb') as file:
+        assert b'/Count 3' in file.read()
+
+
+@pytest.mark.parametrize('secondary_plot', ['None', 'Capital costs'])
+def test_template_matches_new_figure(engine, secondary_plot):
+    first = dict(DEFAULT_SCENARIO, state_name='Texas')
+    second = dict(DEFAULT_SCENARIO, state_name='Hawaii', sim_time_y=10)
+    TEA_report.render_pages([(0, first, secondary_plot)], None, 50, engine)
+    reused = TEA_report.render_pages([(1, second, secondary_plot)], None, 50,
+                                     engine)[0]
+    TEA_report.worker_layout = None
+    new = TEA_report.render_pages([(1, second, secondary_plot)], None, 50,
+                                  engine)[0]
+    np.testing.assert_array_equal(reused, new)
+
+
+@pytest.mark.skipif('spawn' not in multiprocessing.get_all_start_methods(),
+                    reason='the report workers need the spawn start method')
+def test_worker_processes(tmp_path):
+    # The workers build their engine like the given one
+    engine = TEA_engine(precision='float32', activity='profile')
+    assert TEA_report.engine_options(engine)['activity'] == 'profile'
+    scenarios = [dict(DEFAULT_SCENARIO, state_name=state)
+                 for state in ['Texas', 'Ohio', 'Maine']]
+
+    files = TEA_report.render_report(scenarios, str(tmp_path / 'pages'),
+                                     dpi=50, n_workers=2, engine=engine)
+    assert [path.split('/')[-1] for path in files] == [
+        '000_tea_for_Texas.png', '001_tea_for_Ohio.png',
+        '002_tea_for_Maine.png']
+    inline = TEA_report.render_report(scenarios, str(tmp_path / 'inline'),
+                                      dpi=50, n_workers=0, engine=engine)
+    from matplotlib.image import imread
+    for path, expected in zip(files, inline):
+        np.testing.assert_array_equal(imread(path), imread(expected))
+
+    output = str(tmp_path / 'report.pdf')
+    assert TEA_report.render_report(scenarios, output, dpi=50, n_workers=2,
+                                     engine=engine) == [output]
+    with open(output, 'rb') as file:
+        content = file.read()
+    # One raster page per scenario
+    assert b'/Count 3' in content
+    assert content.count(b'/Subtype /Image') == 3
@@ -0,0 +1,148 @@
+import asyncio
+import multiprocessing
+import numpy as np
+import pytest
+
+import TEA_service as TEA_service_module
+from TEA_engine import TEA_engine
+from TEA_service import TEA_service, DEFAULT_SCENARIO, check_scenario, \
+    evaluate_batch, request
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+def serve(engine, client):
+    """
+    Runs a client coroutine against an inline service on localhost
+    """
+    async def main():
+        service = TEA_service(engine, n_workers=0)
+        port = await service.start(port=0)
+        try:
+            return await asyncio.wait_for(client(service, port), 30)
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+
+def test_check_scenario_converts_numbers():
+    scenario = check_scenario(dict(DEFAULT_SCENARIO, sim_time_y='20',
+                                   PUE=['1.02', 1.2]))
+    assert scenario['sim_time_y'] == 20.
+    assert scenario['PUE'] == [1.02, 1.2]
+
+
+@pytest.mark.parametrize('change', [
+    {'sim_time_y': 'twenty'}, {'sim_time_y': 0}, {'PUE': ['x', 'y']},
+    {'PUE': 1.2}, {'lifetime_y': [11, None]}, {'interest_rate': 'nan'},
+    {'lifetime_y': [0, 15]}, {'PUE': [1.02]}, {'price_type': 'Past'},
+    {'state_name': 3}])
+def test_check_scenario_refuses(change):
+    with pytest.raises(ValueError):
+        check_scenario(dict(DEFAULT_SCENARIO, **change))
+
+
+def test_round_trip(engine):
+    async def client(service, port):
+        return await asyncio.gather(
+            request('127.0.0.1', port, DEFAULT_SCENARIO),
+            request('127.0.0.1', port,
+                    dict(DEFAULT_SCENARIO, PUE=['x', 'y'])),
+            request('127.0.0.1', port,
+                    dict(DEFAULT_SCENARIO, sim_time_y='20')),
+            request('127.0.0.1', port,
+                    dict(DEFAULT_SCENARIO, state_name='Atlantis')))
+
+    valid, malformed, string_time, unknown = serve(engine, client)
+    results = engine.compute(**{key: value for key, value in
+                                DEFAULT_SCENARIO.items()
+                                if key != 'case_name'})
+    np.testing.assert_allclose(valid['total_cost_m'],
+                               results['total_cost_m'])
+    assert valid['summary']['Classic']['total_cost_m'] == pytest.approx(
+        results['total_cost_m'][1].sum())
+    assert 'PUE' in malformed['error']
+    assert string_time['total_cost_m'] == valid['total_cost_m']
+    assert 'error' in unknown
+
+
+def test_failed_batch_isolates_scenario(engine):
+    # A scenario failing in the evaluation, past the request checks
+    faulty = check_scenario(dict(DEFAULT_SCENARIO, state_name='Atlantis'))
+
+    async def client(service, port):
+        outcomes = await asyncio.gather(
+            service.evaluate([check_scenario(DEFAULT_SCENARIO)]),
+            service.evaluate([faulty]), return_exceptions=True)
+        # The batcher keeps serving
+        outcomes.append(await request('127.0.0.1', port, DEFAULT_SCENARIO))
+        return outcomes
+
+    valid, error, later = serve(engine, client)
+    assert isinstance(error, KeyError)
+    assert valid[0]['total_cost_m'] == later['total_cost_m']
+
+
+def test_concurrent_requests_share_one_evaluation(engine, monkeypatch):
+    batches = []
+    costs = []
+    compute_costs = engine.compute_costs
+
+    def recorded_batch(engine, scenarios):
+        batches.append(len(scenarios))
+        return evaluate_batch(engine, scenarios)
+
+    def recorded_costs(*args, **kwargs):
+        costs.append(np.shape(args[0]))
+        return compute_costs(*args, **kwargs)
+
+    monkeypatch.setattr(TEA_service_module, 'evaluate_batch', recorded_batch)
+    monkeypatch.setattr(engine, 'compute_costs', recorded_costs)
+
+    async def main():
+        # A wide window, so that every request reaches the same batch
+        service = TEA_service(engine, batch_window=0.5, n_workers=0)
+        port = await service.start(port=0)
+        try:
+            return await asyncio.gather(*[
+                request('127.0.0.1', port,
+                        dict(DEFAULT_SCENARIO, state_name=state))
+                for state in ['Texas', 'Ohio', 'Hawaii', 'Maine']*2])
+        finally:
+            await service.stop()
+
+    responses = asyncio.run(main())
+    assert batches == [8]
+    assert costs == [(8, 240)]
+    assert responses[0]['total_cost_m'] == responses[4]['total_cost_m']
+
+
+@pytest.mark.skipif('spawn' not in multiprocessing.get_all_start_methods(),
+                    reason='the process pool needs the spawn start method')
+def test_heavy_batches_use_the_process_pool(engine):
+    async def main():
+        service = TEA_service(engine, heavy_cells=0, n_workers=1)
+        port = await service.start(port=0)
+        submitted = []
+        submit = service.pool.submit
+
+        def recorded_submit(function, *args):
+            submitted.append(function.__name__)
+            return submit(function, *args)
+
+        service.pool.submit = recorded_submit
+        try:
+            response = await asyncio.wait_for(
+                request('127.0.0.1', port, DEFAULT_SCENARIO), 120)
+        finally:
+            await service.stop()
+        return submitted, response
+
+    submitted, response = asyncio.run(main())
+    assert submitted == ['evaluate_in_worker']
+    inline = evaluate_batch(engine, [check_scenario(DEFAULT_SCENARIO)])[0]
+    np.testing.assert_allclose(response['total_cost_m'],
+                               inline['total_cost_m'])
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from TEA_engine import TEA_engine, COMPONENTS
+from TEA_store import TEA_store, parameter_hash
+
+
+SCENARIO = {'state_name': 'Texas', 'sim_time_y': 5, 'n_rack': 42,
+            'rack_consumption': 10, 'case_name': ['Evaporative', 'Classic'],
+            'PUE': [1.02, 1.2], 'lifetime_y': [11, 15],
+            'installation_init_cost': [48700, 43200],
+            'renewal_cost': [28288, 24343], 'maintenance_rate': [0.15, 0.19],
+            'interest_rate': 0.07, 'price_type': 'Present'}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return TEA_engine()
+
+
+@pytest.fixture
+def store():
+    store = TEA_store(':memory:')
+    yield store
+    store.close()
+
+
+def test_parameter_hash():
+    reordered = dict(reversed(list(SCENARIO.items())))
+    assert parameter_hash(SCENARIO, 'v1') == parameter_hash(reordered, 'v1')
+    assert parameter_hash(SCENARIO, 'v1') != parameter_hash(SCENARIO, 'v2')
+    assert parameter_hash(SCENARIO, 'v1') != parameter_hash(
+        dict(SCENARIO, PUE=[1.02, 1.3]), 'v1')
+
+
+def test_repeated_scenario_served_from_disk(engine, store, monkeypatch):
+    first = store.compute(engine, **SCENARIO)
+
+    def fail(**inputs):
+        raise AssertionError('the stored run should be served')
+    monkeypatch.setattr(engine, 'compute', fail)
+    second = store.compute(engine, **SCENARIO)
+    for name in COMPONENTS + ['month_numbers', 'electricity_price']:
+        np.testing.assert_array_equal(second[name], first[name])
+
+
+def test_query(engine, store):
+    for state, PUE in [('Texas', [1.02, 1.2]), ('Texas', [1.05, 1.3]),
+                       ('Ohio', [1.02, 1.2])]:
+        store.compute(engine, **dict(SCENARIO, state_name=state, PUE=PUE))
+    rows = store.query('state_name = ? AND PUE < ?', ('Texas', 1.1))
+    assert [(row['state_name'], row['PUE'], row['case_name'])
+            for row in rows] == [('Texas', 1.02, 'Evaporative'),
+                                 ('Texas', 1.05, 'Evaporative')]
+    results = store.compute(engine, **SCENARIO)
+    assert rows[0]['total_cost'] == pytest.approx(
+        results['total_cost_m'][0].sum())
+    assert len(store.query()) == 6